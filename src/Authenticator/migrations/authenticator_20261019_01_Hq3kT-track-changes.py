@@ -0,0 +1,44 @@
+"""
+Track changes
+"""
+from yoyo import step
+
+__depends__ = {'authenticator_20190529_01_8bpUj-empty-uneeded-provider-images'}
+
+# Every change to the accounts & providers tables is logged, so a process
+# can reload only the rows another process changed since it last looked.
+TRIGGERS = [
+    # (table, event, the row id, the updated columns)
+    ("accounts", "INSERT", "NEW.id", None),
+    ("accounts", "UPDATE", "NEW.id", "username, provider, token_id"),
+    ("accounts", "DELETE", "OLD.id", None),
+    ("providers", "INSERT", "NEW.id", None),
+    ("providers", "UPDATE", "NEW.id", "name, website, doc_url, image"),
+    ("providers", "DELETE", "OLD.id", None),
+]
+
+
+def trigger_step(table_name, event, row_id, columns):
+    trigger_name = "{}_{}_changes".format(table_name, event.lower())
+    if columns:
+        event = "{} OF {}".format(event, columns)
+    return step(
+        '''CREATE TRIGGER IF NOT EXISTS "{trigger}" AFTER {event} ON "{table}"
+           BEGIN
+               INSERT INTO changes (table_name, row_id) VALUES ('{table}', {row_id});
+           END'''.format(trigger=trigger_name, event=event, table=table_name, row_id=row_id),
+        'DROP TRIGGER "{}"'.format(trigger_name)
+    )
+
+
+steps = [
+    step(
+        '''CREATE TABLE IF NOT EXISTS "changes" (
+            "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL UNIQUE,
+            "table_name" VARCHAR NOT NULL,
+            "row_id" INTEGER NOT NULL
+        )
+        ''',
+        'DROP TABLE "changes"'
+    )
+] + [trigger_step(*trigger) for trigger in TRIGGERS]
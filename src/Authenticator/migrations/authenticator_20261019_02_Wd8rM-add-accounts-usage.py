@@ -0,0 +1,16 @@
+"""
+Add accounts usage
+"""
+from yoyo import step
+
+__depends__ = {'authenticator_20261019_01_Hq3kT-track-changes'}
+
+steps = [
+    step('ALTER TABLE "accounts" ADD COLUMN "usage_count" INTEGER NOT NULL DEFAULT 0'),
+    step('ALTER TABLE "accounts" ADD COLUMN "last_used" INTEGER NOT NULL DEFAULT 0'),
+    # log2 of the sum of 2 ^ (usage time / half life) over the account's uses,
+    # ordering by it is the same as ordering by the decayed usage frequency.
+    step('ALTER TABLE "accounts" ADD COLUMN "usage_rank" REAL NOT NULL DEFAULT 0'),
+    step('CREATE INDEX IF NOT EXISTS "accounts_usage_rank" ON "accounts" ("usage_rank" DESC)',
+         'DROP INDEX "accounts_usage_rank"'),
+]
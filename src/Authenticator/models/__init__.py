@@ -16,16 +16,50 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
-from .keyring import Keyring
-from .logger import Logger
-from .otp import OTP
-
-from .qr_reader import QRReader
-from .screenshot import GNOMEScreenshot
-from .settings import Settings
-
-from .database import Database
-from .provider import Provider
-from .account import Account
-from .accounts_manager import AccountsManager
-from .backup import BackupJSON
+from importlib import import_module
+
+# Public names and the submodule that defines them.
+# They are imported on first access, so QR, screenshot and backup
+# dependencies are only loaded when they're actually needed.
+_LAZY_ATTRS = {
+    "Keyring": ".keyring",
+    "Logger": ".logger",
+    "Tracer": ".tracer",
+    "OTP": ".otp",
+    "Clipboard": ".clipboard",
+
+    "QRReader": ".qr_reader",
+    "QRImport": ".qr_import",
+    "GNOMEScreenshot": ".screenshot",
+    "Settings": ".settings",
+
+    "Database": ".database",
+    "DatabaseMonitor": ".database_monitor",
+    "Provider": ".provider",
+    "Account": ".account",
+    "AccountsManager": ".accounts_manager",
+    "AccountsSnapshot": ".snapshot",
+    "SearchIndex": ".search_index",
+    "FaviconCache": ".favicon_cache",
+    "FaviconFetcher": ".favicon_fetcher",
+    "PixbufCache": ".pixbuf_cache",
+    "ProviderIcons": ".provider_icons",
+    "Usage": ".usage",
+    "Backup": ".backup",
+    "BackupJSON": ".backup",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -17,49 +17,45 @@
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
 from gettext import gettext as _
-from gi.repository import GObject, Gtk, Gdk
 from hashlib import sha256
+from threading import Thread
 from typing import Union
-from Authenticator.models import Database, Keyring, Logger, OTP, Provider
-
-
-class Account(GObject.GObject):
-
-    __gsignals__ = {
-        'otp_out_of_date': (
-            GObject.SignalFlags.RUN_LAST,
-            None,
-            ()
-        ),
-        'otp_updated': (
-            GObject.SignalFlags.RUN_LAST,
-            None,
-            (str, )
-        ),
-        'removed': (
-            GObject.SignalFlags.RUN_LAST,
-            None,
-            ()
-        ),
-    }
-    _provider: Provider = None
-
-    def __init__(self, _id: str, username: str, token_id: str, provider: int):
-        GObject.GObject.__init__(self)
+
+from gi.repository import GLib
+
+from Authenticator.models import Clipboard, Database, Keyring, Logger, OTP, Provider, Tracer, Usage
+
+
+class Account:
+    """
+        An account and its current OTP.
+
+        A compact record: the accounts of a provider share the same
+        Provider object and only the secret token is kept, the OTP
+        is generated from it once per period.
+    """
+    __slots__ = ('id', 'username', '_provider', 'usage_count', 'last_used',
+                 'usage_rank', '_token_id', '_secret', 'pin', '_search_keys')
+
+    def __init__(self, _id: str, username: str, token_id: str, provider: Union[int, Provider],
+                 usage_count: int = 0, last_used: int = 0, usage_rank: float = 0.0,
+                 token: str = None):
         self.id = _id
         self.username = username
         self.provider = provider
+        self.usage_count = usage_count
+        self.last_used = last_used
+        self.usage_rank = usage_rank
         self._token_id = token_id
-        token = Keyring.get_default().get_by_id(self._token_id)
-        self.connect("otp_out_of_date", self._on_otp_out_of_date)
-        if token:
-            self.otp = OTP(token)
-            self._code_generated = True
-        else:
-            self.otp = None
-            self._code_generated = False
-            Logger.error("Could not read the secret code,"
-                         "the keyring keys were reset manually")
+        self._search_keys = (None, None, ())
+        # Placeholders don't have a secret, a known one isn't read back
+        if token_id and not token:
+            with Tracer.phase("Account.keyring_lookup", id=_id):
+                token = Keyring.get_default().get_by_id(self._token_id)
+            if not token:
+                Logger.error("Could not read the secret code,"
+                             "the keyring keys were reset manually")
+        self.set_secret(token)
 
     @staticmethod
     def create(username: str, token: str, provider: int) -> 'Account':
@@ -70,12 +66,110 @@ class Account(GObject.GObject):
         :param token: the OTP secret token
         :return: Account object
         """
-        # Encrypt the token to create a secret_id
-        token_id = sha256(token.encode('utf-8')).hexdigest()
+        token = Account.normalize_token(token)
+        token_id = Account.secret_id(token)
         # Save the account
         obj = Database.get_default().insert_account(username, token_id, provider)
         Keyring.get_default().insert(token_id, provider, username, token)
-        return Account(obj.id, username, token_id, provider)
+        return Account(obj.id, username, token_id, provider, token=token)
+
+    @staticmethod
+    def normalize_token(token: str) -> str:
+        """
+        Remove the spaces of an OTP secret token, base32 is case insensitive.
+        :param token: the OTP secret token
+        :return: the normalized token
+        """
+        return "".join(token.split()).upper()
+
+    @staticmethod
+    def secret_id(token: str) -> str:
+        """
+        The id of an OTP secret token in the keyring & the database.
+        :param token: the OTP secret token
+        :return: the sha256 of the normalized token
+        """
+        return sha256(Account.normalize_token(token).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def secret_ids(token: str) -> {str}:
+        """
+        All the ids an OTP secret token may be stored under.
+
+        The accounts created before the tokens were normalized are
+        stored under the hash of the token as it was typed or imported.
+        :param token: the OTP secret token
+        :return: the current id & the legacy ones
+        """
+        stripped = "".join(token.split())
+        variants = (token, stripped, stripped.lower())
+        legacy_ids = {sha256(variant.encode('utf-8')).hexdigest() for variant in variants}
+        return legacy_ids | {Account.secret_id(token)}
+
+    @staticmethod
+    def create_many(accounts: [(str, str, str)], callback):
+        """
+        Create several accounts, stored in the database in a single transaction.
+
+        The providers that don't exist yet are created, the accounts
+        whose secret is already known are skipped. The secrets are saved
+        in the keyring by a thread, then the rows of the saved ones are
+        inserted and the callback is called on the main loop with the
+        created accounts.
+        :param accounts: list of (username, OTP secret token, provider name)
+        :param callback: called with the list of the created accounts
+        """
+        known_ids = Database.get_default().token_ids
+        providers = {}
+        pending = {}
+        for username, token, provider_name in accounts:
+            if known_ids & Account.secret_ids(token):
+                Logger.debug("[Account] Skipped {}, its secret is already known".format(username))
+                continue
+            token = Account.normalize_token(token)
+            token_id = Account.secret_id(token)
+            known_ids.add(token_id)
+            provider_name = provider_name or _("Default")
+            provider = providers.get(provider_name.lower())
+            if provider is None:
+                provider = Provider.get_by_name(provider_name)
+                if not provider:
+                    provider = Provider.create(provider_name, None, None, None)
+                providers[provider_name.lower()] = provider
+            pending[token_id] = (username or "", token, provider)
+        # The keyring calls are blocking, keep them out of the main loop
+        Thread(target=Account.__store_secrets, args=(pending, callback)).start()
+
+    @staticmethod
+    def __store_secrets(pending: dict, callback):
+        keyring = Keyring.get_default()
+        stored = {}
+        for token_id, (username, token, provider) in pending.items():
+            try:
+                keyring.insert(token_id, provider.provider_id, username, token)
+                stored[token_id] = pending[token_id]
+            except Exception as error:
+                Logger.error("[Account] Couldn't save the secret of {}".format(username))
+                Logger.error(str(error))
+        GLib.idle_add(Account.__on_secrets_stored, stored, callback)
+
+    @staticmethod
+    def __on_secrets_stored(stored: dict, callback):
+        database = Database.get_default()
+        rows = database.insert_accounts(
+            (username, token_id, provider.provider_id)
+            for token_id, (username, _token, provider) in stored.items())
+        new_accounts = []
+        for row in rows:
+            username, token, provider = stored.pop(row.token_id)
+            new_accounts.append(Account(row.id, username, row.token_id, provider, token=token))
+        if stored:
+            # Don't remove the secret of an account that was added meanwhile
+            keyring = Keyring.get_default()
+            for token_id in set(stored) - database.token_ids:
+                keyring.remove(token_id)
+        callback(new_accounts)
+        return False
 
     @staticmethod
     def create_from_json(json_obj: dict) -> 'Account':
@@ -89,10 +183,60 @@ class Account(GObject.GObject):
             provider = Provider.create(provider_name, None, None, None)
         return Account.create(json_obj["label"], json_obj["secret"], provider.provider_id)
 
+    @staticmethod
+    def placeholder(id_: int, username: str, provider: 'Provider') -> 'Account':
+        """
+        Create an Account without a secret, used to display the accounts
+        list before the keyring is loaded.
+        """
+        return Account(id_, username, None, provider)
+
+    @property
+    def is_placeholder(self) -> bool:
+        return self._token_id is None
+
+    @property
+    def has_secret(self) -> bool:
+        return self._secret is not None
+
+    def set_secret(self, token: str):
+        """
+        Set the secret token and generate the current OTP.
+
+        :param token: the OTP secret token or None
+        """
+        self._secret = token
+        self.pin = OTP.get_pin(token) if token else None
+
+    @property
+    def search_keys(self) -> (str, str):
+        """The casefolded username & provider name, used to filter the accounts."""
+        username, provider_name, search_keys = self._search_keys
+        if username != self.username or provider_name != self.provider.name:
+            search_keys = (self.username.casefold(), self.provider.name.casefold())
+            self._search_keys = (self.username, self.provider.name, search_keys)
+        return search_keys
+
     @staticmethod
     def get_by_id(id_: int) -> 'Account':
         obj = Database.get_default().account_by_id(id_)
-        return Account(obj.id, obj.username, obj.token_id, obj.provider)
+        return Account(*obj)
+
+    @staticmethod
+    def get_pin_by_id(id_: int) -> str:
+        """
+        Generate the current OTP of an account without creating an Account.
+
+        The secret is read from the keyring on demand and isn't kept around.
+
+        :param id_: the account id
+        :return: the OTP or None if the account or its secret doesn't exist
+        """
+        obj = Database.get_default().account_by_id(id_)
+        if not obj:
+            return None
+        token = Keyring.get_default().get_by_id(obj.token_id)
+        return OTP.get_pin(token) if token else None
 
     @property
     def provider(self) -> 'Provider':
@@ -125,20 +269,27 @@ class Account(GObject.GObject):
         """
         Database.get_default().delete_account(self.id)
         Keyring.get_default().remove(self._token_id)
-        self.emit("removed")
         Logger.debug("Account '{}' with id {} was removed".format(self.username,
                                                                   self.id))
 
     def copy_pin(self):
         """Copy the OTP to the clipboard."""
+        Clipboard.set(self.pin)
+        timestamp = Usage.get_default().record(self.id)
+        self.usage_count += 1
+        self.last_used = timestamp
+        self.usage_rank = Usage.bump(self.usage_rank, timestamp)
 
-        clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
-        clipboard.set_text(self.otp.pin, -1)
+    def update_otp(self) -> Union[str, None]:
+        """
+        Generate the OTP of the new period.
 
-    def _on_otp_out_of_date(self, *_):
-        if self._code_generated:
-            self.otp.update()
-            self.emit("otp_updated", self.otp.pin)
+        :return: the new OTP
+        """
+        if self._secret:
+            self.pin = OTP.get_pin(self._secret)
+            return self.pin
+        return None
 
     def to_json(self):
         token = Keyring.get_default().get_by_id(self._token_id)
@@ -151,7 +302,7 @@ class Account(GObject.GObject):
                 "type": "OTP",
                 "algorithm": "SHA1",
                 "thumbnail": "Default",
-                "last_used": 0,
+                "last_used": self.last_used,
                 "tags": [self.provider.name]
             }
         return {}
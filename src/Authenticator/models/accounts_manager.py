@@ -17,11 +17,11 @@
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
 from gi.repository import GObject, GLib
-from typing import Iterable
 
 from .account import Account
 from .database import Database
 from .provider import Provider
+from .tracer import Tracer
 
 
 class AccountsManager(GObject.GObject):
@@ -31,6 +31,12 @@ class AccountsManager(GObject.GObject):
             None,
             (int,)
         ),
+        # account id: new OTP, emitted once for all the accounts
+        'codes_updated': (
+            GObject.SignalFlags.RUN_LAST,
+            None,
+            (GObject.TYPE_PYOBJECT,)
+        ),
     }
 
     instance: 'AccountsManager' = None
@@ -84,15 +90,6 @@ class AccountsManager(GObject.GObject):
         if self.props.empty:
             self._stop_progress_countdown()
 
-    def search(self, terms: Iterable[str]):
-        accounts = Database.get_default().search_accounts(terms)
-        _accounts = []
-        for account in accounts:
-            account = Account(*account)
-            if account.otp:
-                _accounts.append(account)
-        return _accounts
-
     @property
     def accounts_per_provider(self):
         return self._accounts_per_provider
@@ -115,21 +112,27 @@ class AccountsManager(GObject.GObject):
         self._alive = False
         self._stop_progress_countdown()
 
-    def update_childes(self, signal: str):
+    def update_codes(self):
+        """Generate the new OTPs and notify about them with a single signal."""
+        codes = {}
         for _, accounts in self._accounts_per_provider:
             for account in accounts:
-                account.emit(signal)
+                pin = account.update_otp()
+                if pin:
+                    codes[account.id] = pin
+        self.emit("codes_updated", codes)
 
     def __update_counter(self, *args):
         if self._alive:
             self.counter -= 1
             if self.counter == 0:
                 self.counter = self.counter_max
-                self.update_childes("otp_out_of_date")
+                self.update_codes()
             self.emit("counter_updated", self.counter)
             return True
         return False
 
+    @Tracer.trace("AccountsManager.fill_accounts")
     def __fill_accounts(self):
         providers = Database.get_default().get_providers(only_used=True)
         for provider in providers:
@@ -137,8 +140,9 @@ class AccountsManager(GObject.GObject):
             provider = Provider(*provider)
             _accounts = []
             for account in accounts:
-                account = Account(*account)
-                if account.otp:
+                # The accounts share their provider object
+                account = Account(*account._replace(provider=provider))
+                if account.has_secret:
                     _accounts.append(account)
             self._accounts_per_provider.append((provider, _accounts))
         self.props.empty = len(self._accounts_per_provider) == 0
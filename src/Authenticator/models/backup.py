@@ -30,16 +30,35 @@ class Backup:
 
     @staticmethod
     def import_accounts(accounts: [dict]):
-        accounts_widget = AccountsWidget.get_default()
-        accounts_manager = AccountsManager.get_default()
+        records = []
         for account in accounts:
             try:
-                new_account = Account.create_from_json(account)
-                accounts_manager.add(new_account.provider, new_account)
-                accounts_widget.append(new_account)
+                tags = account["tags"]
+                records.append((account["label"], account["secret"],
+                                tags[0] if tags else None))
             except Exception as e:
                 Logger.error("[Restore] Failed to import accounts")
                 Logger.error(str(e))
+        Backup.add_accounts(records)
+
+    @staticmethod
+    def add_accounts(accounts: [(str, str, str)], callback=None):
+        """
+        Create several accounts in a single batch and show them.
+
+        The secrets are saved in the keyring in the background.
+        :param accounts: list of (username, OTP secret token, provider name)
+        :param callback: called on the main loop with the created accounts
+        """
+        def on_created(new_accounts: [Account]):
+            accounts_manager = AccountsManager.get_default()
+            for new_account in new_accounts:
+                accounts_manager.add(new_account.provider, new_account)
+            AccountsWidget.get_default().append_many(new_accounts)
+            if callback:
+                callback(new_accounts)
+
+        Account.create_many(accounts, on_created)
 
     @staticmethod
     def export_accounts() -> [dict]:
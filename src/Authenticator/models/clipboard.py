@@ -0,0 +1,38 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+from gi.repository import Gdk, Gtk
+
+
+class Clipboard:
+    """Clipboard handler."""
+
+    @staticmethod
+    def get_default() -> Gtk.Clipboard:
+        """Return the default clipboard."""
+        return Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
+
+    @staticmethod
+    def set(text: str):
+        """Copy a text to the clipboard."""
+        Clipboard.get_default().set_text(text, -1)
+
+    @staticmethod
+    def clear():
+        """Clear the clipboard content."""
+        Clipboard.get_default().clear()
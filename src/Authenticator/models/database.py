@@ -23,11 +23,13 @@ from collections import namedtuple
 from shutil import move
 from typing import Iterable
 
-from Authenticator.models import Logger
+from Authenticator.models import Logger, Tracer
 
 
 Provider = namedtuple('Provider', ['id', 'name', 'website', 'doc_url', 'image'])
-Account = namedtuple('Account', ['id', 'username', 'token_id', 'provider'])
+Account = namedtuple('Account', ['id', 'username', 'token_id', 'provider',
+                                 'usage_count', 'last_used', 'usage_rank'],
+                     defaults=(0, 0, 0.0))
 
 
 class Database:
@@ -36,14 +38,18 @@ class Database:
     # Default instance
     instance = None
     # Database version number
-    db_version: int = 7
+    db_version: int = 9
+    # Number of changes kept in the changes log
+    changes_log_size: int = 1000
 
+    @Tracer.trace("Database.__init__")
     def __init__(self):
         self.migrations_dir = path.join(path.dirname(__file__), '../migrations')
         database_created = self.__create_database_file()
         if database_created:
             self.__apply_migrations()
         self.conn = sqlite3.connect(self.db_file)
+        self.__prune_changes()
 
     @staticmethod
     def get_default():
@@ -80,6 +86,45 @@ class Database:
             Logger.error("[SQL] Couldn't add a new account")
             Logger.error(str(error))
 
+    def insert_accounts(self, accounts: Iterable[tuple]) -> [Account]:
+        """
+        Insert several accounts in a single transaction.
+
+        The accounts the constraints reject, e.g. an already known
+        token id, are skipped instead of failing the whole batch.
+        :param accounts: list of (username, token id, provider id)
+        :return: the inserted accounts, empty if the transaction failed
+        """
+        query = "INSERT INTO accounts (username, token_id, provider) VALUES (?, ?, ?)"
+        cursor = self.conn.cursor()
+        inserted = []
+        try:
+            for username, token_id, provider in accounts:
+                try:
+                    cursor.execute(query, [username, token_id, provider])
+                except sqlite3.IntegrityError as error:
+                    Logger.warning("[SQL] Skipped the account {}: {}".format(username, error))
+                    continue
+                inserted.append(Account(cursor.lastrowid, username, token_id, provider))
+            self.conn.commit()
+            return inserted
+        except Exception as error:
+            self.conn.rollback()
+            Logger.error("[SQL] Couldn't add the new accounts")
+            Logger.error(str(error))
+        return []
+
+    @property
+    def token_ids(self) -> {str}:
+        """The secret ids of all the accounts."""
+        query = "SELECT token_id FROM accounts"
+        try:
+            return {row[0] for row in self.conn.execute(query)}
+        except Exception as error:
+            Logger.error("[SQL] Couldn't fetch the accounts secret ids")
+            Logger.error(str(error))
+        return set()
+
     def insert_provider(self, name: str, website: str,
                         doc_url: str = None, image: str = None):
         """
@@ -179,31 +224,167 @@ class Database:
         # Update a provider by id
         self.__update_by_id("providers", provider_data, id_)
 
-    def search_accounts(self, terms: Iterable[str]) -> Iterable[Account]:
-        if terms:
-            filters = " ".join(terms)
-            if filters:
-                filters = "%" + filters + "%"
-            query = """
-                        SELECT A.* FROM accounts A
-                        JOIN providers P
-                        ON A.provider = P.id
-                        WHERE
-                        A.username LIKE ?
-                        OR
-                        P.name LIKE ?
-                        GROUP BY provider
-                        ORDER BY  A.username ASC
-                    """
-            try:
-                data = self.conn.cursor().execute(query, (filters, filters, ))
-                accounts = data.fetchall()
-                return [Account(*account) for account in accounts]
-            except Exception as error:
-                Logger.error("[SQL]: Couldn't search for an account")
-                Logger.error(str(error))
+    def search_entries(self, account_ids: Iterable[int] = None,
+                       provider_ids: Iterable[int] = None) -> Iterable[tuple]:
+        """
+            Retrieve the searchable fields of the accounts.
+
+            :param account_ids: only retrieve these accounts
+            :param provider_ids: only retrieve the accounts of these providers
+            :return: list of (account id, username, provider name, usage rank)
+        """
+        query = """
+                    SELECT A.id, A.username, P.name, A.usage_rank FROM accounts A
+                    JOIN providers P
+                    ON A.provider = P.id
+                """
+        params = []
+        if account_ids is not None or provider_ids is not None:
+            account_ids = list(account_ids or [])
+            provider_ids = list(provider_ids or [])
+            query += "WHERE A.id IN ({}) OR A.provider IN ({})".format(", ".join("?" * len(account_ids)),
+                                                                       ", ".join("?" * len(provider_ids)))
+            params = account_ids + provider_ids
+        try:
+            data = self.conn.cursor().execute(query, params)
+            return data.fetchall()
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't fetch the accounts search entries")
+            Logger.error(str(error))
+        return []
+
+    def accounts_metas(self, ids: Iterable[int]) -> Iterable[tuple]:
+        """
+            Retrieve the information needed to display a list of accounts.
+
+            :param ids: the accounts ids
+            :return: list of (account id, username, provider name, provider image)
+        """
+        query = """
+                    SELECT A.id, A.username, P.name, P.image FROM accounts A
+                    JOIN providers P
+                    ON A.provider = P.id
+                    WHERE A.id IN ({})
+                """
+        try:
+            return self.__select_in(query, ids)
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't fetch the accounts metas")
+            Logger.error(str(error))
         return []
 
+    def accounts_by_ids(self, ids: Iterable[int]) -> Iterable[Account]:
+        """
+            Get a list of accounts by their IDs
+            :param ids: the accounts ids
+            :return: list of the existing accounts
+        """
+        try:
+            return [Account(*account)
+                    for account in self.__select_in("SELECT * FROM accounts WHERE id IN ({})", ids)]
+        except Exception as error:
+            Logger.error("[SQL] Couldn't get the accounts by IDs")
+            Logger.error(str(error))
+        return []
+
+    def usage_since(self, timestamp: int) -> Iterable[tuple]:
+        """
+            Retrieve the usage of the accounts used since a specific time.
+
+            :param timestamp: the time to start from
+            :return: list of (account id, last used, usage rank)
+        """
+        query = "SELECT id, last_used, usage_rank FROM accounts WHERE last_used >= ?"
+        try:
+            return self.conn.execute(query, (timestamp, )).fetchall()
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't fetch the accounts usage")
+            Logger.error(str(error))
+        return []
+
+    def add_usage(self, usages: Iterable[tuple], merge_ranks):
+        """
+            Add the uses of several accounts in a single transaction.
+
+            The uses are added to the stored ones by the UPDATE itself,
+            the uses another process writes at the same time are kept.
+
+            :param usages: list of (account id, uses count, last use, uses rank)
+            :param merge_ranks: combines the stored rank and the new uses one
+        """
+        self.conn.create_function("merge_ranks", 2, merge_ranks)
+        query = ("UPDATE accounts SET usage_count = usage_count + ?, "
+                 "last_used = MAX(last_used, ?), "
+                 "usage_rank = merge_ranks(usage_rank, ?) WHERE id = ?")
+        try:
+            self.conn.executemany(query, [(usage_count, last_used, usage_rank, account_id)
+                                          for account_id, usage_count, last_used, usage_rank in usages])
+            self.conn.commit()
+        except Exception as error:
+            self.conn.rollback()
+            Logger.error("[SQL]: Couldn't update the accounts usage")
+            Logger.error(str(error))
+
+    @property
+    def last_used(self) -> int:
+        """The most recent time an account was used."""
+        query = "SELECT MAX(last_used) FROM accounts"
+        try:
+            return self.conn.execute(query).fetchone()[0] or 0
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't fetch the last use")
+            Logger.error(str(error))
+        return 0
+
+    @property
+    def data_version(self) -> int:
+        """
+            A number that changes each time another connection
+            (e.g. another process) commits a change to the database.
+
+            :return: int
+        """
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @property
+    def last_change(self) -> int:
+        """
+            The id of the last change of the accounts or providers tables.
+
+            :return: int
+        """
+        try:
+            return self.conn.execute("SELECT MAX(id) FROM changes").fetchone()[0] or 0
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't fetch the last change")
+            Logger.error(str(error))
+        return 0
+
+    def changes_since(self, change_id: int) -> (int, dict):
+        """
+            Retrieve the rows that changed after a specific change.
+
+            :param change_id: the last change already known
+            :return: the last change id and a dict of the changed rows ids
+                     per table, None if the changes log doesn't go back that far
+        """
+        try:
+            first_change = self.conn.execute("SELECT MIN(id) FROM changes").fetchone()[0]
+            data = self.conn.execute("SELECT id, table_name, row_id FROM changes WHERE id > ?",
+                                     (change_id, )).fetchall()
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't fetch the changes log")
+            Logger.error(str(error))
+            return change_id, None
+        if first_change is not None and first_change > change_id + 1:
+            return self.last_change, None
+        changes = {"accounts": set(), "providers": set()}
+        last_change = change_id
+        for row_change_id, table_name, row_id in data:
+            changes.setdefault(table_name, set()).add(row_id)
+            last_change = max(last_change, row_change_id)
+        return last_change, changes
+
     @property
     def accounts_count(self):
         """
@@ -271,6 +452,7 @@ class Database:
                 created = True
         return created
 
+    @Tracer.trace("Database.apply_migrations")
     def __apply_migrations(self):
         """
         Create the needed tables to run the application.
@@ -282,6 +464,34 @@ class Database:
         with backend.lock():
             backend.apply_migrations(backend.to_apply(migrations))
 
+    def __prune_changes(self):
+        """
+        Only keep the most recent changes in the changes log.
+        """
+        query = "DELETE FROM changes WHERE id <= (SELECT MAX(id) FROM changes) - ?"
+        try:
+            self.conn.execute(query, (Database.changes_log_size, ))
+            self.conn.commit()
+        except Exception as error:
+            Logger.error("[SQL]: Couldn't prune the changes log")
+            Logger.error(str(error))
+
+    def __select_in(self, query: str, ids: Iterable[int]) -> list:
+        """
+        Run a query with an "IN ({})" clause for a list of ids.
+
+        SQLite limits the number of variables in a query,
+        so the ids are split into chunks.
+        """
+        ids = list(ids)
+        rows = []
+        chunk_size = 500
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i:i + chunk_size]
+            data = self.conn.cursor().execute(query.format(", ".join("?" * len(chunk))), chunk)
+            rows.extend(data.fetchall())
+        return rows
+
     def __count(self, table_name: str) -> int:
         query = "SELECT COUNT(id) AS count FROM " + table_name
         try:
@@ -0,0 +1,78 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+from gi.repository import Gio, GLib, GObject
+
+from Authenticator.models import Database, Logger
+
+
+class DatabaseMonitor(GObject.GObject):
+    """
+        Notifies about the changes other processes commit to the database.
+
+        The database file is watched with a Gio.FileMonitor, once it's
+        modified PRAGMA data_version tells whether another connection
+        committed something and the changes log tells which rows changed.
+    """
+    __gsignals__ = {
+        # A dict of the changed rows ids per table,
+        # None if everything has to be reloaded.
+        'changed': (
+            GObject.SignalFlags.RUN_LAST,
+            None,
+            (GObject.TYPE_PYOBJECT, )
+        ),
+    }
+
+    instance: 'DatabaseMonitor' = None
+    # Delay in ms used to coalesce the file writes of a commit
+    DELAY: int = 200
+
+    def __init__(self):
+        GObject.GObject.__init__(self)
+        database = Database.get_default()
+        self._data_version = database.data_version
+        self._last_change = database.last_change
+        self._source_id = 0
+
+        gfile = Gio.File.new_for_path(database.db_file)
+        self._monitor = gfile.monitor_file(Gio.FileMonitorFlags.NONE, None)
+        self._monitor.connect("changed", self.__on_file_changed)
+
+    @staticmethod
+    def get_default() -> 'DatabaseMonitor':
+        if DatabaseMonitor.instance is None:
+            DatabaseMonitor.instance = DatabaseMonitor()
+        return DatabaseMonitor.instance
+
+    def __on_file_changed(self, *_):
+        if self._source_id == 0:
+            self._source_id = GLib.timeout_add(DatabaseMonitor.DELAY,
+                                               self.__check_changes)
+
+    def __check_changes(self):
+        self._source_id = 0
+        database = Database.get_default()
+        data_version = database.data_version
+        # Our own commits don't change the data version
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._last_change, changes = database.changes_since(self._last_change)
+            Logger.debug("[DatabaseMonitor] The database was changed by another process")
+            self.emit("changed", changes)
+        return False
@@ -0,0 +1,316 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+from hashlib import sha256
+from os import makedirs, path, remove
+from time import time
+
+from gi.repository import GLib
+
+from Authenticator.models import Logger, Provider
+
+
+class FaviconCache:
+    """
+        Index of the providers images stored in the cache dir.
+
+        The images are stored under the hash of their content, so the
+        same favicon is stored once whatever the website it comes from.
+        For each website, the index keeps the file, where it was
+        downloaded from, when, and the HTTP validators to revalidate it.
+
+        The websites without a favicon are remembered too, and retried
+        after a delay that doubles on each failure.
+
+        The files that aren't used anymore are removed and the least
+        recently used favicons are evicted once the cache goes over its
+        disk budget, the images used by a provider are always kept.
+    """
+    # Default instance
+    instance: 'FaviconCache' = None
+    # In seconds, a favicon is revalidated after a month
+    MAX_AGE: int = 30 * 24 * 60 * 60
+    # In seconds, the first retry of a failed lookup is after a day...
+    RETRY_DELAY: int = 24 * 60 * 60
+    # ...and the delay between two retries is at most a month
+    MAX_RETRY_DELAY: int = 30 * 24 * 60 * 60
+    # Delay in seconds before writing the changed index
+    SAVE_DELAY: int = 5
+    INDEX_VERSION: int = 1
+
+    def __init__(self):
+        # file name: {"size": bytes, "used": timestamp}
+        self._files = {}
+        # website: {"file", "source", "fetched", "etag", "last_modified",
+        #           "failures", "retry"}
+        self._sites = {}
+        self._source_id = 0
+        self.__load()
+
+    @staticmethod
+    def get_default() -> 'FaviconCache':
+        """Return the default instance of FaviconCache."""
+        if FaviconCache.instance is None:
+            FaviconCache.instance = FaviconCache()
+        return FaviconCache.instance
+
+    @staticmethod
+    def path() -> str:
+        return path.join(Provider.CACHE_DIR, "favicons.json")
+
+    @staticmethod
+    def write(data: bytes, extension: str = None) -> str:
+        """
+        Store an image under the hash of its content.
+
+        Doesn't touch the index, it can be called from any thread.
+
+        :param data: the image content
+        :param extension: the image extension, png, ico...
+        :return: the file name
+        """
+        filename = sha256(data).hexdigest()
+        if extension:
+            filename += "." + extension.lstrip(".").lower()
+        file_path = path.join(Provider.CACHE_DIR, filename)
+        if not path.exists(file_path):
+            makedirs(Provider.CACHE_DIR, exist_ok=True)
+            # Atomic write, a crash can't leave a truncated image
+            GLib.file_set_contents(file_path, data)
+        return filename
+
+    def store(self, data: bytes, extension: str = None) -> str:
+        """
+        Store an image chosen by the user.
+
+        :param data: the image content
+        :param extension: the image extension, png, svg...
+        :return: the image path
+        """
+        filename = FaviconCache.write(data, extension)
+        self.__add_file(filename)
+        self.__schedule_save()
+        return path.join(Provider.CACHE_DIR, filename)
+
+    def image_path(self, website: str) -> str:
+        """
+        Return the cached favicon of a website, even an outdated one.
+
+        :param website: the normalized website
+        :return: the image path or None
+        """
+        site = self._sites.get(website)
+        if site and site["file"]:
+            file_path = path.join(Provider.CACHE_DIR, site["file"])
+            if path.exists(file_path):
+                return file_path
+        return None
+
+    def is_fresh(self, website: str) -> bool:
+        """
+        Whether the website can be served from the cache without any request.
+
+        :param website: the normalized website
+        :return: True if its favicon is cached & recent enough,
+                 or if it failed recently and shouldn't be retried yet
+        """
+        site = self._sites.get(website)
+        if site is None:
+            return False
+        now = time()
+        if now < site["retry"]:
+            return True
+        return (self.image_path(website) is not None
+                and now < site["fetched"] + FaviconCache.MAX_AGE)
+
+    def validators(self, website: str) -> (str, str, str):
+        """
+        Return what's needed to revalidate the cached favicon of a website.
+
+        :param website: the normalized website
+        :return: (source URL, ETag, Last-Modified), all None if nothing is cached
+        """
+        site = self._sites.get(website)
+        if site is None or self.image_path(website) is None:
+            return None, None, None
+        return site["source"], site["etag"], site["last_modified"]
+
+    def add(self, website: str, filename: str, source: str = None,
+            etag: str = None, last_modified: str = None):
+        """
+        Record the favicon downloaded for a website.
+
+        :param website: the normalized website
+        :param filename: the file name returned by write
+        :param source: the URL the favicon was downloaded from
+        :param etag: the ETag header of the response
+        :param last_modified: the Last-Modified header of the response
+        """
+        self._sites[website] = {
+            "file": filename,
+            "source": source,
+            "fetched": int(time()),
+            "etag": etag,
+            "last_modified": last_modified,
+            "failures": 0,
+            "retry": 0,
+        }
+        self.__add_file(filename)
+        self.__schedule_save()
+
+    def revalidated(self, website: str):
+        """
+        Record that the cached favicon of a website didn't change.
+
+        :param website: the normalized website
+        """
+        site = self._sites.get(website)
+        if site:
+            site.update(fetched=int(time()), failures=0, retry=0)
+            self.touch(self.image_path(website))
+
+    def failed(self, website: str):
+        """
+        Record that the favicon of a website couldn't be found.
+
+        The cached favicon, if any, is kept.
+
+        :param website: the normalized website
+        """
+        site = self._sites.setdefault(website, {
+            "file": None, "source": None, "fetched": 0,
+            "etag": None, "last_modified": None, "failures": 0, "retry": 0,
+        })
+        delay = min(FaviconCache.RETRY_DELAY * 2 ** site["failures"],
+                    FaviconCache.MAX_RETRY_DELAY)
+        site["failures"] += 1
+        site["retry"] = int(time()) + delay
+        self.__schedule_save()
+
+    def touch(self, image_path: str):
+        """
+        Mark an image as used.
+
+        :param image_path: the image path, the images that are not in
+                           the cache are ignored
+        """
+        if not image_path:
+            return
+        file_info = self._files.get(path.basename(image_path))
+        if file_info is not None and path.dirname(image_path) == Provider.CACHE_DIR:
+            file_info["used"] = int(time())
+            self.__schedule_save()
+
+    def collect_garbage(self, used_images: [str], used_websites: [str], max_bytes: int):
+        """
+        Remove the images that are not needed anymore.
+
+        Only the files of the index are removed, the images used by a
+        provider never are. The files that neither a provider nor a
+        website uses are removed, then the least recently used favicons
+        until the cache fits in max_bytes. The websites without a favicon
+        that no provider uses anymore are forgotten.
+
+        :param used_images: the images of the providers
+        :param used_websites: the normalized websites of the providers
+        :param max_bytes: the disk budget of the cache
+        """
+        used = {path.basename(image) for image in used_images
+                if image and path.dirname(image) in ("", Provider.CACHE_DIR)}
+        for filename in list(self._files):
+            if not path.exists(path.join(Provider.CACHE_DIR, filename)):
+                del self._files[filename]
+        referenced = {site["file"] for site in self._sites.values() if site["file"]}
+
+        removed = 0
+        for filename in list(self._files):
+            if filename not in used and filename not in referenced:
+                removed += self.__remove(filename)
+        total = sum(file_info["size"] for file_info in self._files.values())
+        candidates = sorted((item for item in self._files.items() if item[0] not in used),
+                            key=lambda item: item[1]["used"])
+        for filename, file_info in candidates:
+            if total <= max_bytes:
+                break
+            total -= file_info["size"]
+            removed += self.__remove(filename)
+
+        used_websites = set(used_websites)
+        for website, site in list(self._sites.items()):
+            if site["file"] and site["file"] not in self._files:
+                site.update(file=None, source=None, etag=None, last_modified=None)
+            if not site["file"] and website not in used_websites:
+                del self._sites[website]
+        if removed:
+            Logger.debug("[FaviconCache] Removed {} images".format(removed))
+        self.save()
+
+    def save(self):
+        """Write the index."""
+        if self._source_id > 0:
+            GLib.Source.remove(self._source_id)
+            self._source_id = 0
+        data = json.dumps({"version": FaviconCache.INDEX_VERSION,
+                           "files": self._files,
+                           "sites": self._sites})
+        try:
+            makedirs(Provider.CACHE_DIR, exist_ok=True)
+            GLib.file_set_contents(FaviconCache.path(), data.encode("utf-8"))
+        except (GLib.Error, OSError) as error:
+            Logger.error("[FaviconCache] Couldn't save the favicons index")
+            Logger.error(str(error))
+
+    def __load(self):
+        try:
+            with open(FaviconCache.path(), 'r') as file_obj:
+                data = json.load(file_obj)
+            if data.get("version") == FaviconCache.INDEX_VERSION:
+                self._files = data["files"]
+                self._sites = data["sites"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            Logger.warning("[FaviconCache] Ignoring an invalid favicons index")
+            Logger.warning(str(error))
+
+    def __add_file(self, filename: str):
+        try:
+            size = path.getsize(path.join(Provider.CACHE_DIR, filename))
+        except OSError:
+            return
+        self._files[filename] = {"size": size, "used": int(time())}
+
+    def __remove(self, filename: str) -> int:
+        self._files.pop(filename, None)
+        try:
+            remove(path.join(Provider.CACHE_DIR, filename))
+            return 1
+        except OSError as error:
+            Logger.warning("[FaviconCache] Couldn't remove {}: {}".format(filename, error))
+        return 0
+
+    def __schedule_save(self):
+        if self._source_id == 0:
+            self._source_id = GLib.timeout_add_seconds(FaviconCache.SAVE_DELAY,
+                                                       self.__on_save_timeout)
+
+    def __on_save_timeout(self):
+        self._source_id = 0
+        self.save()
+        return False
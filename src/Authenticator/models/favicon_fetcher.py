@@ -0,0 +1,209 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+from mimetypes import guess_extension
+from threading import Thread
+from urllib.parse import urlsplit
+
+from gi.repository import GLib
+
+from Authenticator.models import FaviconCache, Logger
+
+
+class FaviconFetcher:
+    """
+        Downloads the providers favicons.
+
+        A single event loop thread does all the downloads, with a limited
+        number of them running at the same time. The requests for the same
+        website share a single download and its result is delivered once
+        on the main loop to all of them. A download nobody waits for
+        anymore is cancelled.
+
+        The favicons are served from FaviconCache while they're fresh,
+        then revalidated with a conditional request.
+    """
+    # Default instance
+    instance: 'FaviconFetcher' = None
+    # Maximum number of downloads running at the same time
+    MAX_DOWNLOADS: int = 4
+
+    def __init__(self):
+        self._loop = None
+        self._semaphore = None
+        # website: its running download
+        self._downloads = {}
+
+    @staticmethod
+    def get_default() -> 'FaviconFetcher':
+        """Return the default instance of FaviconFetcher."""
+        if FaviconFetcher.instance is None:
+            FaviconFetcher.instance = FaviconFetcher()
+        return FaviconFetcher.instance
+
+    @staticmethod
+    def normalize(website: str) -> str:
+        """
+        Normalize a website so the different spellings of a URL share a download.
+
+        :param website: the provider website
+        :return: the normalized URL
+        """
+        website = website.strip()
+        if "://" not in website:
+            website = "https://" + website
+        url = urlsplit(website)
+        return "{}://{}{}".format(url.scheme.lower(), url.netloc.lower(),
+                                  url.path.rstrip("/"))
+
+    def fetch(self, website: str, callback):
+        """
+        Download the favicon of a website.
+
+        :param website: the provider website
+        :param callback: called on the main loop with the downloaded
+                         image path, or None if there is no favicon
+        """
+        website = self.normalize(website)
+        cache = FaviconCache.get_default()
+        if cache.is_fresh(website):
+            callback(cache.image_path(website))
+            return
+        download = self._downloads.get(website)
+        if download is None:
+            download = self._downloads[website] = _Download()
+            # asyncio & pyfavicon (aiohttp, bs4) are only needed once
+            # a favicon is downloaded, don't load them on startup
+            import asyncio
+            if self._loop is None:
+                self.__start()
+            coroutine = self.__download(website, download, cache.validators(website))
+            download.future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        download.callbacks.append(callback)
+
+    def cancel(self, website: str, callback):
+        """
+        Stop waiting for a favicon, its callback won't be called.
+
+        The download itself is cancelled if nobody else waits for it.
+
+        :param website: the website given to fetch
+        :param callback: the callback given to fetch
+        """
+        website = self.normalize(website)
+        download = self._downloads.get(website)
+        if download is None or callback not in download.callbacks:
+            return
+        download.callbacks.remove(callback)
+        if not download.callbacks:
+            del self._downloads[website]
+            download.future.cancel()
+
+    def __start(self):
+        import asyncio
+        self._loop = asyncio.new_event_loop()
+        # Hackish solution for https://github.com/python/cpython/pull/13548
+        self._loop.set_exception_handler(lambda loop, ctx: None)
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            # Created in the loop thread, before any download runs
+            self._semaphore = asyncio.Semaphore(FaviconFetcher.MAX_DOWNLOADS)
+            self._loop.run_forever()
+
+        Thread(target=run, name="FaviconFetcher", daemon=True).start()
+
+    async def __download(self, website: str, download: '_Download', validators):
+        import asyncio
+        import aiohttp
+        from pyfavicon import Favicon
+        source, etag, last_modified = validators
+        # (status, file name, source URL, ETag, Last-Modified)
+        result = (_FAILED, None, None, None, None)
+        async with self._semaphore:
+            try:
+                async with aiohttp.ClientSession() as session:
+                    if source:
+                        headers = {}
+                        if etag:
+                            headers["If-None-Match"] = etag
+                        if last_modified:
+                            headers["If-Modified-Since"] = last_modified
+                        result = await self.__get(session, source, headers)
+                    if result[0] is _FAILED:
+                        icons = await Favicon().from_url(website)
+                        largest_icon = icons.get_largest()
+                        if largest_icon and largest_icon.data:
+                            filename = FaviconCache.write(largest_icon.data,
+                                                          largest_icon.extension)
+                            result = (_STORED, filename, None, None, None)
+                        elif largest_icon:
+                            result = await self.__get(session, str(largest_icon.link), {},
+                                                      largest_icon.extension)
+            except asyncio.CancelledError:
+                return
+            except Exception as error:
+                Logger.error("[Favicon] Couldn't download the favicon of {}".format(website))
+                Logger.error(str(error))
+        GLib.idle_add(self.__deliver, website, download, result)
+
+    @staticmethod
+    async def __get(session, url: str, headers: dict, extension: str = None):
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return _NOT_MODIFIED, None, None, None, None
+            if response.status != 200:
+                return _FAILED, None, None, None, None
+            data = await response.read()
+            if not extension:
+                content_type = response.headers.get("Content-Type", "")
+                extension = guess_extension(content_type.split(";")[0].strip())
+            filename = FaviconCache.write(data, extension)
+            return (_STORED, filename, url,
+                    response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+    def __deliver(self, website: str, download: '_Download', result):
+        # The download was cancelled in the meantime
+        if self._downloads.get(website) is not download:
+            return False
+        del self._downloads[website]
+        status, filename, source, etag, last_modified = result
+        cache = FaviconCache.get_default()
+        if status is _STORED:
+            cache.add(website, filename, source, etag, last_modified)
+        elif status is _NOT_MODIFIED:
+            cache.revalidated(website)
+        else:
+            cache.failed(website)
+        image_path = cache.image_path(website)
+        for callback in download.callbacks:
+            callback(image_path)
+        return False
+
+
+_STORED = "stored"
+_NOT_MODIFIED = "not-modified"
+_FAILED = "failed"
+
+
+class _Download:
+    __slots__ = ('future', 'callbacks')
+
+    def __init__(self):
+        self.future = None
+        self.callbacks = []
@@ -18,6 +18,8 @@
 """
 from gi.repository import GObject, Secret
 
+from Authenticator.models import Tracer
+
 
 class Keyring(GObject.GObject):
     ID: str = "com.github.bilelmoussaoui.Authenticator"
@@ -27,6 +29,7 @@ class Keyring(GObject.GObject):
 
     can_be_locked: GObject.Property = GObject.Property(type=bool, default=False)
 
+    @Tracer.trace("Keyring.__init__")
     def __init__(self):
         GObject.GObject.__init__(self)
         self.schema = Secret.Schema.new(Keyring.ID,
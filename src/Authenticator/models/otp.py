@@ -17,6 +17,7 @@
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
 import binascii
+from typing import Union
 from pyotp import TOTP
 
 
@@ -49,6 +50,19 @@ class OTP(TOTP):
         except (binascii.Error, ValueError, TypeError):
             return False
 
+    @staticmethod
+    def get_pin(token: str) -> Union[str, None]:
+        """
+        Generate the current OTP of a token without keeping an OTP object around.
+
+        :param token: OTP token
+        :return: the OTP or None if the token is invalid
+        """
+        try:
+            return TOTP(token).now()
+        except binascii.Error:
+            return None
+
     def update(self):
         """
             Generate a new OTP based on the same token.
@@ -0,0 +1,124 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+from os import stat
+
+from gi.repository import GdkPixbuf, GLib
+
+from Authenticator.models import Logger
+
+
+class PixbufCache:
+    """
+        Process wide cache of the scaled providers images.
+
+        The images are decoded & scaled on a worker thread and kept by
+        (path, modification time, size), the least recently used ones
+        are dropped once the cache goes over MAX_BYTES.
+    """
+    # Default instance
+    instance: 'PixbufCache' = None
+    # Maximum memory used by the cached pixbufs
+    MAX_BYTES: int = 8 * 1024 * 1024
+    # Number of images decoded at the same time
+    WORKERS: int = 2
+
+    def __init__(self):
+        # (path, mtime, size): pixbuf, least recently used first
+        self._pixbufs = OrderedDict()
+        self._bytes = 0
+        # (path, mtime, size): callbacks waiting for the pixbuf
+        self._pending = {}
+        self._executor = None
+
+    @staticmethod
+    def get_default() -> 'PixbufCache':
+        """Return the default instance of PixbufCache."""
+        if PixbufCache.instance is None:
+            PixbufCache.instance = PixbufCache()
+        return PixbufCache.instance
+
+    def lookup(self, image_path: str, size: int) -> GdkPixbuf.Pixbuf:
+        """
+        Return a cached image without loading it.
+
+        :param image_path: the image file
+        :param size: the width & height of the scaled image
+        :return: the pixbuf or None if it's not cached
+        """
+        key = self.__key(image_path, size)
+        pixbuf = self._pixbufs.get(key)
+        if pixbuf is not None:
+            self._pixbufs.move_to_end(key)
+        return pixbuf
+
+    def load(self, image_path: str, size: int, callback):
+        """
+        Load a scaled image.
+
+        :param image_path: the image file
+        :param size: the width & height of the scaled image
+        :param callback: called on the main loop with the pixbuf,
+                         or None if the image couldn't be loaded
+        """
+        key = self.__key(image_path, size)
+        pixbuf = self._pixbufs.get(key)
+        if pixbuf is not None:
+            self._pixbufs.move_to_end(key)
+            callback(pixbuf)
+            return
+        if key is None:
+            callback(None)
+            return
+        if key in self._pending:
+            self._pending[key].append(callback)
+            return
+        self._pending[key] = [callback]
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=PixbufCache.WORKERS,
+                                                thread_name_prefix="PixbufCache")
+        self._executor.submit(self.__decode, key)
+
+    @staticmethod
+    def __key(image_path: str, size: int):
+        try:
+            return image_path, stat(image_path).st_mtime_ns, size
+        except (OSError, TypeError):
+            return None
+
+    def __decode(self, key):
+        image_path, _, size = key
+        pixbuf = None
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(image_path, size, size, False)
+        except GLib.Error as error:
+            Logger.debug("[PixbufCache] Couldn't load {}: {}".format(image_path, error))
+        GLib.idle_add(self.__deliver, key, pixbuf)
+
+    def __deliver(self, key, pixbuf: GdkPixbuf.Pixbuf):
+        if pixbuf is not None:
+            self._pixbufs[key] = pixbuf
+            self._bytes += pixbuf.get_byte_length()
+            while self._bytes > PixbufCache.MAX_BYTES and len(self._pixbufs) > 1:
+                _, evicted = self._pixbufs.popitem(last=False)
+                self._bytes -= evicted.get_byte_length()
+        for callback in self._pending.pop(key, []):
+            callback(pixbuf)
+        return False
@@ -17,14 +17,19 @@
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
 from os import path
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
 from Authenticator.models import Database
 
 
 class Provider:
+    __slots__ = ('provider_id', 'name', 'website', 'doc_url', 'image')
 
     instance: 'Provider' = None
+    # Where the providers images are stored
+    CACHE_DIR = path.join(GLib.get_user_cache_dir(), "Authenticator")
+    # The icon used when a provider doesn't have an image
+    _fallback_image_path: str = None
 
     def __init__(self,
                  provider_id: int = None,
@@ -64,16 +69,26 @@ class Provider:
 
     @property
     def image_path(self) -> str:
-        from Authenticator.widgets import ProviderImage
-        cached_icon = path.join(ProviderImage.CACHE_DIR, self.image)
-        if path.exists(cached_icon):
-            return cached_icon
-        else:
+        return Provider.get_image_path(self.image)
+
+    @staticmethod
+    def get_image_path(image: str) -> str:
+        """
+        Return the path of a provider image or of the fallback icon.
+
+        :param image: the image stored in the database
+        """
+        if image:
+            cached_icon = path.join(Provider.CACHE_DIR, image)
+            if path.exists(cached_icon):
+                return cached_icon
+        # The icon theme lookup is slow, do it once.
+        if Provider._fallback_image_path is None:
             theme = Gtk.IconTheme.get_default()
             icon_info = theme.lookup_icon("image-missing", 48, 0)
             if icon_info:
-                return icon_info.get_filename()
-        return None
+                Provider._fallback_image_path = icon_info.get_filename()
+        return Provider._fallback_image_path
 
     def update(self, **provider_data):
         self.name = provider_data.get("name", self.name)
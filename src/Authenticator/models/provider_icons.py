@@ -0,0 +1,93 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+
+from gi.repository import GdkPixbuf, Gio, GLib
+
+from Authenticator.models import Logger
+
+
+class ProviderIcons:
+    """
+        The icons of the providers catalog, packed at build time.
+
+        The icons are stored as raw RGBA pixels in the gresource, which is
+        memory mapped: an icon is a pixbuf over a slice of the resource,
+        it's neither copied nor decoded.
+    """
+    # Default instance
+    instance: 'ProviderIcons' = None
+    RESOURCE_PATH = "/com/github/bilelmoussaoui/Authenticator/provider-icons"
+
+    def __init__(self):
+        # lowercased provider name: icon number
+        self._icons = {}
+        self._sizes = []
+        # size: the pixels of the atlas
+        self._atlases = {}
+        try:
+            data = Gio.resources_lookup_data(ProviderIcons.RESOURCE_PATH + ".json",
+                                             Gio.ResourceLookupFlags.NONE)
+            index = json.loads(data.get_data().decode("utf-8"))
+            self._icons = index["icons"]
+            self._sizes = sorted(index["sizes"])
+        except (GLib.Error, ValueError, KeyError) as error:
+            Logger.warning("[ProviderIcons] Couldn't load the providers icons")
+            Logger.warning(str(error))
+
+    @staticmethod
+    def get_default() -> 'ProviderIcons':
+        """Return the default instance of ProviderIcons."""
+        if ProviderIcons.instance is None:
+            ProviderIcons.instance = ProviderIcons()
+        return ProviderIcons.instance
+
+    def has_icon(self, name: str) -> bool:
+        """
+        Whether the catalog has an icon for a provider.
+
+        :param name: the provider name
+        """
+        return bool(name) and name.lower() in self._icons
+
+    def lookup(self, name: str, size: int) -> GdkPixbuf.Pixbuf:
+        """
+        Return the icon of a provider.
+
+        :param name: the provider name
+        :param size: the width & height of the icon
+        :return: the pixbuf or None if the catalog doesn't have it
+        """
+        if not self.has_icon(name):
+            return None
+        # The smallest packed size that doesn't need to be scaled up
+        atlas_size = next((packed for packed in self._sizes if packed >= size),
+                          self._sizes[-1])
+        atlas = self._atlases.get(atlas_size)
+        if atlas is None:
+            atlas = self._atlases[atlas_size] = Gio.resources_lookup_data(
+                "{}-{}.rgba".format(ProviderIcons.RESOURCE_PATH, atlas_size),
+                Gio.ResourceLookupFlags.NONE)
+        length = atlas_size * atlas_size * 4
+        pixels = GLib.Bytes.new_from_bytes(atlas, self._icons[name.lower()] * length, length)
+        pixbuf = GdkPixbuf.Pixbuf.new_from_bytes(pixels, GdkPixbuf.Colorspace.RGB, True, 8,
+                                                 atlas_size, atlas_size, atlas_size * 4)
+        if atlas_size != size:
+            pixbuf = pixbuf.scale_simple(size, size, GdkPixbuf.InterpType.BILINEAR)
+        return pixbuf
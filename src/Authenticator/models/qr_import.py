@@ -0,0 +1,152 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import cpu_count, path, walk
+
+from gi.repository import GLib, GObject
+
+from Authenticator.models import Account, Backup, Database, Logger, QRReader
+
+
+class QRImport(GObject.GObject):
+    """
+        Imports the accounts of a set of QR codes images.
+
+        PIL & zbar are CPU bound and hold the GIL, the images are decoded
+        in parallel by a pool of processes. The accounts are deduplicated
+        by secret and added in a single batch once all the images are read.
+    """
+    __gsignals__ = {
+        # decoded images, total images
+        'progress': (
+            GObject.SignalFlags.RUN_LAST,
+            None,
+            (int, int)
+        ),
+        # added accounts, duplicated accounts, images without a QR code
+        'finished': (
+            GObject.SignalFlags.RUN_LAST,
+            None,
+            (int, int, int)
+        ),
+    }
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff")
+    # Number of images decoded at the same time
+    WORKERS: int = max(1, min(4, cpu_count() or 1))
+
+    def __init__(self, paths: [str]):
+        """
+        :param paths: the images, the folders are searched recursively
+        """
+        GObject.GObject.__init__(self)
+        self._filenames = QRImport.list_images(paths)
+        self._futures = []
+        self._executor = None
+        self._accounts = []
+        self._decoded = 0
+        self._failed = 0
+
+    @property
+    def total(self) -> int:
+        return len(self._filenames)
+
+    @staticmethod
+    def list_images(paths: [str]) -> [str]:
+        """
+        List the images to import.
+
+        :param paths: files or folders
+        :return: the given files & the images of the folders
+        """
+        filenames = []
+        for image_path in paths:
+            if path.isdir(image_path):
+                for root, _, names in walk(image_path):
+                    filenames.extend(path.join(root, name) for name in sorted(names)
+                                     if name.lower().endswith(QRImport.IMAGE_EXTENSIONS))
+            elif path.isfile(image_path):
+                filenames.append(image_path)
+        return filenames
+
+    def start(self):
+        """Start decoding the images, progress is reported on the main loop."""
+        if not self._filenames:
+            GLib.idle_add(self.__finish)
+            return
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Forking a process running GTK & other threads isn't safe
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(max_workers=min(QRImport.WORKERS, self.total),
+                                             mp_context=context)
+        for filename in self._filenames:
+            future = self._executor.submit(QRReader.read_file, filename)
+            # Called from the executor thread
+            future.add_done_callback(lambda future, filename=filename:
+                                     GLib.idle_add(self.__on_image_decoded, filename, future))
+            self._futures.append(future)
+        self.emit("progress", 0, self.total)
+
+    def cancel(self):
+        """Stop decoding the images, nothing is imported."""
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def __on_image_decoded(self, filename: str, future):
+        if future.cancelled() or self._executor is None:
+            return False
+        accounts = []
+        try:
+            accounts = future.result()
+        except Exception as error:
+            Logger.error("[QRImport] Couldn't decode {}".format(filename))
+            Logger.error(str(error))
+        if not accounts:
+            self._failed += 1
+        self._accounts.extend(accounts)
+        self._decoded += 1
+        self.emit("progress", self._decoded, self.total)
+        if self._decoded == self.total:
+            self.cancel()
+            self.__finish()
+        return False
+
+    def __finish(self):
+        known = Database.get_default().token_ids
+        records = []
+        duplicates = 0
+        for account in self._accounts:
+            if known & Account.secret_ids(account["token"]):
+                duplicates += 1
+                continue
+            known.add(Account.secret_id(account["token"]))
+            records.append((account["username"], account["token"], account["provider"]))
+        if records:
+            Backup.add_accounts(records, lambda added: self.__on_added(added, duplicates))
+        else:
+            self.__on_added([], duplicates)
+        return False
+
+    def __on_added(self, added: list, duplicates: int):
+        Logger.debug("[QRImport] {} accounts added, {} duplicates, {} images without a QR code"
+                     .format(len(added), duplicates, self._failed))
+        self.emit("finished", len(added), duplicates, self._failed)
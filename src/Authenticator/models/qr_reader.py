@@ -16,45 +16,236 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
-from os import remove, path
+from base64 import b32encode, b64decode
+from io import BytesIO
+from math import ceil
 from urllib.parse import urlparse, parse_qsl, unquote
 
-from PIL import Image
-from pyzbar.pyzbar import decode
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+from pyzbar.pyzbar import decode, ZBarSymbol
 
 from Authenticator.models import Logger, OTP
 
 
 class QRReader:
+    """
+        Reads the OTP URIs of QR codes images.
+
+        The images are decoded through a cascade of passes, from the
+        cheapest to the most expensive one, stopping at the first pass
+        that finds a QR code:
+            - grayscale, downscaled so its longest side is at most FAST_SIZE
+            - grayscale, at full resolution if it was downscaled
+            - binarized against the local mean, for low contrast captures,
+              downscaled then at full resolution
+    """
+    # Longest side of the image decoded by the first pass
+    FAST_SIZE: int = 800
+    # Radius of the local mean used by the binarization
+    BINARIZE_RADIUS: int = 8
+    # How much darker than the local mean a pixel must be to be black
+    BINARIZE_OFFSET: int = 4
+
+    @staticmethod
+    def read_file(filename: str) -> [dict]:
+        """
+        Read the accounts of the QR codes of an image, the file is kept.
+
+        :param filename: the image path
+        :return: a list of dicts of the username, provider & token
+        """
+        with open(filename, 'rb') as file_obj:
+            return QRReader.from_bytes(file_obj.read())
 
     @staticmethod
-    def from_file(filename: str):
-        decoded_data = decode(Image.open(filename))
-        if path.isfile(filename):
-            remove(filename)
+    def from_bytes(data: bytes) -> [dict]:
+        """
+        Read the accounts of the QR codes of an in memory image.
+
+        :param data: the image content, PNG...
+        :return: a list of dicts of the username, provider & token
+                 of every account found, empty if there's none
+        """
         try:
-            # See https://github.com/google/google-authenticator/wiki/Key-Uri-Format
-            # for a description of the URL format
-            url = urlparse(decoded_data[0].data.decode())
-            query_params = parse_qsl(url.query)
-            url_data = dict(query_params)
-
-            username = None
-            label = unquote(url.path.lstrip("/"))
-            if ":" in label:
-                provider, username = label.split(":", maxsplit=1)
-            else:
-                provider = label
-            # provider information could also be in the query params
-            provider = url_data.get("issuer", provider)
-
-            token = url_data.get("secret")
-            assert OTP.is_valid(token)
-
-            return {
-                'username': username,
-                'provider': provider,
-                'token': token
-            }
-        except (KeyError, IndexError):
+            with Image.open(BytesIO(data)) as image:
+                decoded_data = QRReader.decode(image)
+        except OSError:
             Logger.error("Invalid QR image")
+            return []
+        accounts = []
+        for content in decoded_data:
+            try:
+                accounts.extend(QRReader.parse(content.decode()))
+            # A malformed export payload can fail anywhere in its parsing
+            except (UnicodeDecodeError, ValueError, KeyError,
+                    TypeError, AttributeError, IndexError) as error:
+                Logger.error("Invalid QR code")
+                Logger.error(str(error))
+        return accounts
+
+    @staticmethod
+    def parse(uri: str) -> [dict]:
+        """
+        Read the accounts of an otpauth or otpauth-migration URI.
+
+        :param uri: the QR code content
+        :return: a list of dicts of the username, provider & token
+        """
+        url = urlparse(uri)
+        if url.scheme == "otpauth-migration":
+            return QRReader.parse_migration(url)
+        if url.scheme != "otpauth":
+            return []
+        # See https://github.com/google/google-authenticator/wiki/Key-Uri-Format
+        # for a description of the URL format
+        url_data = dict(parse_qsl(url.query))
+
+        username = None
+        label = unquote(url.path.lstrip("/"))
+        if ":" in label:
+            provider, username = label.split(":", maxsplit=1)
+        else:
+            provider = label
+        # provider information could also be in the query params
+        provider = url_data.get("issuer", provider)
+
+        token = url_data.get("secret")
+        if not OTP.is_valid(token):
+            return []
+        return [{
+            'username': username,
+            'provider': provider,
+            'token': token
+        }]
+
+    @staticmethod
+    def parse_migration(url) -> [dict]:
+        """
+        Read the accounts of a Google Authenticator export.
+
+        The data query parameter is a base64 encoded protobuf message:
+            MigrationPayload { repeated OtpParameters otp_parameters = 1; ... }
+            OtpParameters { bytes secret = 1; string name = 2; string issuer = 3;
+                            Algorithm algorithm = 4; DigitCount digits = 5;
+                            OtpType type = 6; ... }
+        Only the TOTP accounts using the default SHA1 & 6 digits are supported.
+
+        :param url: the parsed otpauth-migration URI
+        :return: a list of dicts of the username, provider & token
+        """
+        # parse_qsl decodes the + of the base64 data as spaces
+        data = dict(parse_qsl(url.query))["data"].replace(" ", "+")
+        payload = b64decode(data + "=" * (-len(data) % 4))
+        accounts = []
+        skipped = 0
+        for number, value in _protobuf_fields(payload):
+            if number != 1:
+                continue
+            params = dict(_protobuf_fields(value))
+            # 0 is unspecified, 1 is SHA1 / 6 digits, 2 is TOTP
+            if (params.get(4, 0) not in (0, 1) or params.get(5, 0) not in (0, 1)
+                    or params.get(6, 2) != 2 or not params.get(1)):
+                skipped += 1
+                continue
+            name = params.get(2, b"").decode()
+            provider = params.get(3, b"").decode()
+            if ":" in name:
+                label_provider, name = name.split(":", maxsplit=1)
+                provider = provider or label_provider
+            accounts.append({
+                'username': name.strip(),
+                'provider': provider.strip(),
+                'token': b32encode(params[1]).decode().rstrip("=")
+            })
+        if skipped:
+            Logger.warning("[QRReader] Skipped {} unsupported accounts".format(skipped))
+        return accounts
+
+    @staticmethod
+    def decode(image: Image.Image) -> [bytes]:
+        """
+        Decode the QR codes of an image.
+
+        :param image: the image
+        :return: the content of each QR code found, empty if there's none
+        """
+        gray = image.convert("L")
+        factor = ceil(max(gray.size) / QRReader.FAST_SIZE)
+        small = None
+        if factor > 1:
+            width, height = gray.size
+            small = gray.resize((width // factor, height // factor), Image.BOX)
+        passes = [
+            lambda: small,
+            lambda: gray,
+            lambda: QRReader.binarize(small) if small else None,
+            lambda: QRReader.binarize(gray),
+        ]
+        for number, make_image in enumerate(passes):
+            pass_image = make_image()
+            if pass_image is None:
+                continue
+            results = decode(pass_image, symbols=[ZBarSymbol.QRCODE])
+            if results:
+                Logger.debug("[QRReader] Decoded by the pass {}".format(number))
+                return [result.data for result in results]
+        return []
+
+    @staticmethod
+    def binarize(image: Image.Image) -> Image.Image:
+        """
+        Threshold a grayscale image against its local mean.
+
+        :param image: the grayscale image
+        :return: a black & white image
+        """
+        image = ImageOps.autocontrast(image, cutoff=1)
+        local_mean = image.filter(ImageFilter.BoxBlur(QRReader.BINARIZE_RADIUS))
+        # How much darker than its surroundings each pixel is
+        darkness = ImageChops.subtract(local_mean, image)
+        offset = QRReader.BINARIZE_OFFSET
+        local = darkness.point(lambda value: 0 if value > offset else 255)
+        # The inside of the modules bigger than the local mean radius
+        # is as dark as its surroundings, keep it black too
+        global_ = image.point(lambda value: 0 if value < 128 else 255)
+        return ImageChops.darker(local, global_)
+
+
+def _protobuf_fields(buffer: bytes):
+    """
+    Iterate over the fields of a protobuf message.
+
+    :param buffer: the encoded message
+    :return: (field number, value) pairs, the varints as int,
+             the length delimited fields as bytes
+    """
+    position = 0
+    while position < len(buffer):
+        key, position = _protobuf_varint(buffer, position)
+        number, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = _protobuf_varint(buffer, position)
+        elif wire_type == 2:
+            length, position = _protobuf_varint(buffer, position)
+            value = buffer[position:position + length]
+            position += length
+        elif wire_type in (1, 5):
+            length = 8 if wire_type == 1 else 4
+            value = int.from_bytes(buffer[position:position + length], "little")
+            position += length
+        else:
+            raise ValueError("Unsupported protobuf wire type {}".format(wire_type))
+        yield number, value
+
+
+def _protobuf_varint(buffer: bytes, position: int) -> (int, int):
+    value = shift = 0
+    while True:
+        if position >= len(buffer):
+            raise ValueError("Truncated protobuf message")
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
@@ -16,11 +16,13 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
-from os import path
+from os import path, remove
 from tempfile import NamedTemporaryFile
 
 from gi.repository import Gio, GLib
 
+from Authenticator.models import Logger
+
 
 class GNOMEScreenshot:
     """
@@ -34,31 +36,71 @@ class GNOMEScreenshot:
         pass
 
     @staticmethod
-    def area(filename: str = None) -> str:
+    def area_bytes_async(callback):
         """
-            Take a screen shot of an area and save it to a specific filename
-            Using GNOME Shell Screenshot Interface.
-            :param filename: output filename
-            :type filename: str
+            Take a screen shot of an area without blocking the main loop.
+
+            The area selection waits for the user, the D-Bus calls are
+            made asynchronously. The capture is written to the cache dir,
+            which the host shell and the Flatpak sandbox share, read back
+            once and removed right away.
+            :param callback: called on the main loop with the PNG content,
+                             or None if it failed or was cancelled
         """
-        if not filename:
-            filename = path.join(GLib.get_user_cache_dir(),
-                                 path.basename(NamedTemporaryFile().name))
-        bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
-        screen_proxy = Gio.DBusProxy.new_sync(bus,
-                                              Gio.DBusProxyFlags.NONE,
-                                              None,
-                                              GNOMEScreenshot.interface,
-                                              GNOMEScreenshot.path,
-                                              GNOMEScreenshot.interface,
-                                              None)
-        x, y, width, height = screen_proxy.call_sync('SelectArea', None, Gio.DBusCallFlags.NONE,
-                                                     -1, None).unpack()
-
-        args = GLib.Variant('(iiiibs)', (x, y, width, height, False, filename
-                                         )
-                            )
-        screenshot = screen_proxy.call_sync('ScreenshotArea', args,
-                                            Gio.DBusCallFlags.NONE, -1, None)
-        success, filename = screenshot.unpack()
-        return filename if success else None
+        filename = path.join(GLib.get_user_cache_dir(),
+                             path.basename(NamedTemporaryFile().name))
+
+        def on_screenshot(proxy, result):
+            try:
+                success, filename_used = proxy.call_finish(result).unpack()
+            except GLib.Error as error:
+                Logger.error("[Screenshot] Couldn't take the screenshot")
+                Logger.error(str(error))
+                callback(None)
+                return
+            callback(GNOMEScreenshot.__read_capture(filename_used) if success else None)
+
+        def on_area_selected(proxy, result):
+            try:
+                x, y, width, height = proxy.call_finish(result).unpack()
+            except GLib.Error as error:
+                # Cancelled by the user
+                Logger.debug("[Screenshot] No area selected: {}".format(error))
+                callback(None)
+                return
+            args = GLib.Variant('(iiiibs)', (x, y, width, height, False, filename))
+            proxy.call('ScreenshotArea', args, Gio.DBusCallFlags.NONE, -1, None,
+                       on_screenshot)
+
+        def on_proxy_created(_, result):
+            try:
+                proxy = Gio.DBusProxy.new_for_bus_finish(result)
+            except GLib.Error as error:
+                Logger.error("[Screenshot] Couldn't reach the GNOME Shell")
+                Logger.error(str(error))
+                callback(None)
+                return
+            proxy.call('SelectArea', None, Gio.DBusCallFlags.NONE, -1, None,
+                       on_area_selected)
+
+        Gio.DBusProxy.new_for_bus(Gio.BusType.SESSION,
+                                  Gio.DBusProxyFlags.NONE,
+                                  None,
+                                  GNOMEScreenshot.interface,
+                                  GNOMEScreenshot.path,
+                                  GNOMEScreenshot.interface,
+                                  None,
+                                  on_proxy_created)
+
+    @staticmethod
+    def __read_capture(filename: str) -> bytes:
+        try:
+            with open(filename, 'rb') as file_obj:
+                return file_obj.read()
+        except OSError as error:
+            Logger.error("[Screenshot] Couldn't read the capture")
+            Logger.error(str(error))
+            return None
+        finally:
+            if path.exists(filename):
+                remove(filename)
@@ -0,0 +1,269 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Iterable
+
+from Authenticator.models import Database, Logger, Provider, Usage
+
+
+class SearchIndex:
+    """
+        In-memory search index of the accounts.
+
+        Maps the suffixes of the normalized tokens of the accounts usernames
+        and providers names to the accounts ids, a prefix lookup of the
+        suffixes finds the tokens containing a term. It's built once from the database and
+        only the rows changed by another process are reloaded afterwards.
+        Searching it doesn't query the database, create Account objects
+        nor read the keyring. The results are ranked by how often and
+        how recently the accounts were used, see Usage.
+
+        Together with Account.get_pin_by_id, it's the read-only model used
+        by the search provider, which doesn't load the AccountsManager.
+    """
+    # Default instance
+    instance: 'SearchIndex' = None
+
+    _SPLIT_RE = re.compile(r"\W+")
+    # Maximum number of cached results metadata
+    METAS_CACHE_SIZE: int = 256
+
+    def __init__(self):
+        # Sorted list of the suffixes of the known tokens, used for lookups
+        self._suffixes = []
+        # suffix: set of accounts ids
+        self._postings = {}
+        # account id: its tokens, used to narrow down previous results
+        self._account_tokens = {}
+        # account id: its sort key, the results are sorted by username
+        self._sort_keys = {}
+        # account id: its usage rank, the most used accounts come first
+        self._ranks = {}
+        # The most recent use known by the index
+        self._last_used = 0
+        # account id: its metadata, least recently used first
+        self._metas = OrderedDict()
+        self._data_version = None
+        self._last_change = 0
+        self._built = False
+
+    @staticmethod
+    def get_default() -> 'SearchIndex':
+        """Return the default instance of SearchIndex."""
+        if SearchIndex.instance is None:
+            SearchIndex.instance = SearchIndex()
+        return SearchIndex.instance
+
+    @staticmethod
+    def normalize(text: str) -> [str]:
+        """
+        Split a text into normalized search tokens.
+
+        :param text: the text to tokenize
+        :return: list of tokens
+        """
+        return [token for token in SearchIndex._SPLIT_RE.split(text.casefold()) if token]
+
+    def build(self):
+        """(Re)build the index from the database."""
+        database = Database.get_default()
+        self._data_version = database.data_version
+        self._last_change = database.last_change
+        postings = {}
+        account_tokens = {}
+        sort_keys = {}
+        ranks = {}
+        entries = database.search_entries()
+        for account_id, username, provider_name, usage_rank in entries:
+            tokens = tuple(set(self.normalize(username) + self.normalize(provider_name)))
+            account_tokens[account_id] = tokens
+            sort_keys[account_id] = username.casefold()
+            ranks[account_id] = usage_rank
+            for suffix in self.__suffixes(tokens):
+                postings.setdefault(suffix, set()).add(account_id)
+        self._postings = postings
+        self._account_tokens = account_tokens
+        self._sort_keys = sort_keys
+        self._ranks = ranks
+        self._last_used = database.last_used
+        self._metas.clear()
+        self._suffixes = sorted(postings)
+        self._built = True
+        Logger.debug("[SearchIndex] Indexed {} accounts".format(len(entries)))
+
+    def refresh(self):
+        """Reload the accounts that changed since the index was built."""
+        if not self._built:
+            self.build()
+            return
+        database = Database.get_default()
+        # Cheap check, only changes when another process commits
+        data_version = database.data_version
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self._last_change, changes = database.changes_since(self._last_change)
+        if changes is None or len(changes["accounts"]) + len(changes["providers"]) > 500:
+            self.build()
+            return
+        # The usage isn't tracked in the changes log, it's updated too often
+        for account_id, last_used, usage_rank in database.usage_since(self._last_used):
+            if account_id in self._ranks:
+                self._ranks[account_id] = usage_rank
+            self._last_used = max(self._last_used, last_used)
+        if not changes["accounts"] and not changes["providers"]:
+            return
+        entries = database.search_entries(changes["accounts"], changes["providers"])
+        for account_id in changes["accounts"] | {entry[0] for entry in entries}:
+            self.__remove(account_id)
+        for account_id, username, provider_name, usage_rank in entries:
+            self.__add(account_id, username, provider_name, usage_rank)
+        Logger.debug("[SearchIndex] Reloaded {} accounts".format(len(entries)))
+
+    def search(self, terms: Iterable[str]) -> [int]:
+        """
+        Search for the accounts matching all the terms.
+
+        A term matches an account if one of its tokens contains it,
+        like the SQL LIKE '%term%' search did.
+
+        :param terms: the search terms
+        :return: list of accounts ids, the most used first then by username
+        """
+        self.refresh()
+        tokens = [token for term in terms for token in self.normalize(term)]
+        if not tokens:
+            return []
+        results = None
+        for token in tokens:
+            ids = self.__lookup(token)
+            results = ids if results is None else results & ids
+            if not results:
+                return []
+        return sorted(results, key=self.__sort_key)
+
+    def filter(self, ids: Iterable[int], terms: Iterable[str]) -> [int]:
+        """
+        Narrow down a previous results set.
+
+        Only the given accounts are tested, so the cost depends on the
+        number of previous results and not on the number of accounts.
+
+        :param ids: the previous results
+        :param terms: the new search terms
+        :return: the accounts ids matching all the terms, in the same order
+        """
+        self.refresh()
+        tokens = [token for term in terms for token in self.normalize(term)]
+        if not tokens:
+            return []
+        results = []
+        for account_id in ids:
+            account_tokens = self._account_tokens.get(account_id)
+            # The account was removed since the previous search
+            if account_tokens is None:
+                continue
+            if all(any(token in account_token for account_token in account_tokens)
+                   for token in tokens):
+                results.append(account_id)
+        return results
+
+    def bump(self, account_id: int, timestamp: int):
+        """
+        Rank up an account used by this process.
+
+        The uses recorded by another process are reloaded on refresh.
+
+        :param account_id: the account id
+        :param timestamp: when the account was used
+        """
+        if account_id in self._ranks:
+            self._ranks[account_id] = Usage.bump(self._ranks[account_id], timestamp)
+
+    def get_metas(self, ids: Iterable[int]) -> [(int, dict)]:
+        """
+        Return the metadata of the search results.
+
+        The missing ones are fetched from the database with a single query,
+        the secrets are never read.
+
+        :param ids: the accounts ids
+        :return: list of (account id, {name, description, gicon})
+        """
+        self.refresh()
+        ids = list(ids)
+        missing = [account_id for account_id in ids if account_id not in self._metas]
+        if missing:
+            for account_id, username, provider_name, image in Database.get_default().accounts_metas(missing):
+                self._metas[account_id] = {
+                    "name": username,
+                    "description": "{} - {}".format(provider_name, username),
+                    "gicon": Provider.get_image_path(image) or "",
+                }
+        metas = []
+        for account_id in ids:
+            meta = self._metas.get(account_id)
+            # The account was removed
+            if meta is None:
+                continue
+            self._metas.move_to_end(account_id)
+            metas.append((account_id, meta))
+        while len(self._metas) > SearchIndex.METAS_CACHE_SIZE:
+            self._metas.popitem(last=False)
+        return metas
+
+    def __add(self, account_id: int, username: str, provider_name: str, usage_rank: float):
+        tokens = tuple(set(self.normalize(username) + self.normalize(provider_name)))
+        self._account_tokens[account_id] = tokens
+        self._sort_keys[account_id] = username.casefold()
+        self._ranks[account_id] = usage_rank
+        for suffix in self.__suffixes(tokens):
+            if suffix not in self._postings:
+                self._postings[suffix] = set()
+                insort(self._suffixes, suffix)
+            self._postings[suffix].add(account_id)
+
+    def __remove(self, account_id: int):
+        self._sort_keys.pop(account_id, None)
+        self._ranks.pop(account_id, None)
+        self._metas.pop(account_id, None)
+        for suffix in self.__suffixes(self._account_tokens.pop(account_id, ())):
+            ids = self._postings[suffix]
+            ids.discard(account_id)
+            if not ids:
+                del self._postings[suffix]
+                del self._suffixes[bisect_left(self._suffixes, suffix)]
+
+    def __sort_key(self, account_id: int) -> (float, str):
+        return -self._ranks[account_id], self._sort_keys[account_id]
+
+    @staticmethod
+    def __suffixes(tokens: Iterable[str]) -> {str}:
+        return {token[start:] for token in tokens for start in range(len(token))}
+
+    def __lookup(self, term: str) -> set:
+        # The suffixes starting with the term are those of the tokens containing it
+        ids = set()
+        index = bisect_left(self._suffixes, term)
+        while index < len(self._suffixes) and self._suffixes[index].startswith(term):
+            ids |= self._postings[self._suffixes[index]]
+            index += 1
+        return ids
@@ -0,0 +1,111 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+from os import path, makedirs, remove
+
+from gi.repository import GLib
+
+from Authenticator.models import Account, Logger, Provider
+
+
+class AccountsSnapshot:
+    """
+        A non-secret copy of the accounts list.
+
+        It's written on a clean shutdown and used on the next startup to
+        render the accounts list before the database and the keyring are
+        loaded. It only contains the accounts ids, usernames and the
+        providers information, never the secrets or their identifiers.
+    """
+    # Bump it whenever the file format changes
+    VERSION: int = 1
+
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def path() -> str:
+        return path.join(GLib.get_user_cache_dir(), "Authenticator",
+                         "accounts-snapshot.json")
+
+    @staticmethod
+    def save(accounts_per_provider: [('Provider', ['Account'])]):
+        """
+        Write the snapshot of the accounts list.
+
+        :param accounts_per_provider: a list of (provider, accounts)
+        """
+        providers = []
+        for provider, accounts in accounts_per_provider:
+            if not accounts:
+                continue
+            providers.append({
+                "id": provider.provider_id,
+                "name": provider.name,
+                "website": provider.website,
+                "doc_url": provider.doc_url,
+                "image": provider.image,
+                "accounts": [[account.id, account.username]
+                             for account in accounts]
+            })
+        data = json.dumps({"version": AccountsSnapshot.VERSION,
+                           "providers": providers})
+        try:
+            makedirs(path.dirname(AccountsSnapshot.path()), exist_ok=True)
+            # Atomic write, a crash can't leave a truncated snapshot
+            GLib.file_set_contents(AccountsSnapshot.path(), data.encode("utf-8"))
+        except (GLib.Error, OSError) as error:
+            Logger.error("[Snapshot] Couldn't save the accounts snapshot")
+            Logger.error(str(error))
+
+    @staticmethod
+    def load() -> [('Provider', ['Account'])]:
+        """
+        Read the snapshot of the accounts list.
+
+        The returned accounts are placeholders, they don't have an OTP.
+
+        :return: a list of (provider, accounts) or None if there's no usable snapshot
+        """
+        try:
+            with open(AccountsSnapshot.path(), 'r') as file_obj:
+                data = json.load(file_obj)
+            if data.get("version") != AccountsSnapshot.VERSION:
+                return None
+            accounts_per_provider = []
+            for provider_data in data["providers"]:
+                provider = Provider(provider_data["id"], provider_data["name"],
+                                    provider_data["website"], provider_data["doc_url"],
+                                    provider_data["image"])
+                accounts = [Account.placeholder(account_id, username, provider)
+                            for account_id, username in provider_data["accounts"]]
+                accounts_per_provider.append((provider, accounts))
+            return accounts_per_provider
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            Logger.warning("[Snapshot] Ignoring an invalid accounts snapshot")
+            Logger.warning(str(error))
+        return None
+
+    @staticmethod
+    def clear():
+        """Remove the snapshot."""
+        if path.exists(AccountsSnapshot.path()):
+            remove(AccountsSnapshot.path())
@@ -0,0 +1,139 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+import atexit
+import json
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from os import environ, getpid
+from time import perf_counter, time
+
+from Authenticator.models import Logger
+
+
+class Tracer:
+    """
+        Startup phases tracer.
+
+        Records how long each phase of the startup takes and writes them
+        in the Chrome trace event format, which can be opened in
+        chrome://tracing or Perfetto and compared across releases.
+
+        It's enabled with the --trace command line option or by setting
+        the AUTHENTICATOR_TRACE environment variable to the output file.
+    """
+    # Default instance of Tracer
+    instance: 'Tracer' = None
+    # Environment variable used to enable tracing
+    ENV: str = "AUTHENTICATOR_TRACE"
+
+    def __init__(self, filename: str = None):
+        self.filename = filename
+        self._events = []
+        self._lock = threading.Lock()
+        self._origin = perf_counter()
+        self._started_at = time()
+        if filename:
+            atexit.register(self.save)
+
+    @staticmethod
+    def get_default() -> 'Tracer':
+        """Return the default instance of Tracer."""
+        if Tracer.instance is None:
+            Tracer.instance = Tracer(environ.get(Tracer.ENV))
+        return Tracer.instance
+
+    @staticmethod
+    def enable(filename: str):
+        """Start tracing into a specific file."""
+        if Tracer.instance is None:
+            Tracer.instance = Tracer(filename)
+        elif Tracer.instance.filename != filename:
+            if not Tracer.instance.enabled:
+                atexit.register(Tracer.instance.save)
+            Tracer.instance.filename = filename
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.filename)
+
+    @staticmethod
+    @contextmanager
+    def phase(name: str, **args):
+        """
+        Trace a phase.
+
+        :param name: the phase name
+        :param args: extra information stored with the phase
+        """
+        tracer = Tracer.get_default()
+        if not tracer.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            tracer.add(name, start, perf_counter(), args)
+
+    @staticmethod
+    def trace(name: str):
+        """Decorator that traces every call of a function as a phase."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with Tracer.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add(self, name: str, start: float, end: float, args: dict = None):
+        event = {
+            "name": name,
+            "cat": "startup",
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6),
+            "dur": round((end - start) * 1e6),
+            "pid": getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+
+    def save(self):
+        """Write the recorded phases to the output file."""
+        if not self.enabled:
+            return
+        with self._lock:
+            events = list(self._events)
+        data = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "started_at": self._started_at,
+            }
+        }
+        try:
+            with open(self.filename, 'w') as file_obj:
+                json.dump(data, file_obj, indent=1)
+        except OSError as error:
+            Logger.error("[Tracer] Couldn't write the trace file")
+            Logger.error(str(error))
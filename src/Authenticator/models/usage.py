@@ -0,0 +1,122 @@
+"""
+ Copyright © 2017 Bilal Elmoussaoui <bil.elmoussaoui@gmail.com>
+
+ This file is part of Authenticator.
+
+ Authenticator is free software: you can redistribute it and/or
+ modify it under the terms of the GNU General Public License as published
+ by the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+
+ Authenticator is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+
+ You should have received a copy of the GNU General Public License
+ along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
+"""
+from math import log2
+from time import time
+
+from gi.repository import GLib
+
+from Authenticator.models import Database, Logger
+
+
+class Usage:
+    """
+        Records when the accounts are used to rank the search results.
+
+        Uses are buffered and written to the database in a single
+        transaction a few seconds later, or when the application is closed.
+
+        The rank of an account is log2(sum(2 ^ (t / HALF_LIFE))) over the
+        times t it was used: a use is worth half as much after HALF_LIFE,
+        and ranks can be compared without being recomputed over time.
+    """
+    # Default instance
+    instance: 'Usage' = None
+    # In seconds, a use is worth half as much after a week
+    HALF_LIFE: int = 7 * 24 * 60 * 60
+    # Delay in seconds before writing the buffered uses
+    FLUSH_DELAY: int = 5
+
+    def __init__(self):
+        # list of (account id, timestamp)
+        self._pending = []
+        self._source_id = 0
+
+    @staticmethod
+    def get_default() -> 'Usage':
+        """Return the default instance of Usage."""
+        if Usage.instance is None:
+            Usage.instance = Usage()
+        return Usage.instance
+
+    @staticmethod
+    def bump(rank: float, timestamp: int) -> float:
+        """
+        Compute the new rank of an account after it was used.
+
+        :param rank: the current rank, 0 if it was never used
+        :param timestamp: when the account was used
+        :return: the new rank
+        """
+        return Usage.merge(rank, timestamp / Usage.HALF_LIFE)
+
+    @staticmethod
+    def merge(rank: float, other_rank: float) -> float:
+        """
+        Combine the ranks of two sets of uses.
+
+        :param rank: a rank, 0 if there's no use
+        :param other_rank: another rank, 0 if there's no use
+        :return: the rank of all the uses
+        """
+        if not rank:
+            return other_rank
+        if not other_rank:
+            return rank
+        high, low = max(rank, other_rank), min(rank, other_rank)
+        return high + log2(1 + 2 ** (low - high))
+
+    def record(self, account_id: int) -> int:
+        """
+        Record that an account was used.
+
+        :param account_id: the account id
+        :return: the timestamp of the use
+        """
+        timestamp = int(time())
+        self._pending.append((account_id, timestamp))
+        if self._source_id == 0:
+            self._source_id = GLib.timeout_add_seconds(Usage.FLUSH_DELAY,
+                                                       self.__on_flush_timeout)
+        return timestamp
+
+    def flush(self):
+        """Write the buffered uses to the database."""
+        if self._source_id > 0:
+            GLib.Source.remove(self._source_id)
+            self._source_id = 0
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        # account id: [uses count, last use, uses rank]
+        usages = {}
+        for account_id, timestamp in pending:
+            usage = usages.setdefault(account_id, [0, 0, 0.0])
+            usage[0] += 1
+            usage[1] = max(usage[1], timestamp)
+            usage[2] = Usage.bump(usage[2], timestamp)
+        # The removed accounts aren't matched by the update
+        Database.get_default().add_usage([(account_id, *usage) for account_id, usage in usages.items()],
+                                         Usage.merge)
+        Logger.debug("[Usage] Saved {} uses".format(len(pending)))
+
+    def __on_flush_timeout(self):
+        self._source_id = 0
+        self.flush()
+        return False
@@ -16,14 +16,39 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
+from importlib import import_module
 
-from .notification import Notification
-from .provider_image import ProviderImage
-from .utils import export_json, import_json
-from .window import Window, WindowView
+# Public names and the submodule that defines them.
+# Widgets are imported on first access, so the favicon fetcher and the
+# templates of windows that are never opened don't slow down the startup.
+_LAZY_ATTRS = {
+    "Notification": ".notification",
+    "ProviderImage": ".provider_image",
+    "export_json": ".utils",
+    "import_json": ".utils",
+    "import_qr_images": ".utils",
+    "import_qr_folder": ".utils",
+    "Window": ".window",
+    "WindowView": ".window",
 
-from .accounts.add import AddAccountWindow
-from .accounts.edit import EditAccountWindow
-from .accounts.list import AccountsWidget
+    "AddAccountWindow": ".accounts.add",
+    "EditAccountWindow": ".accounts.edit",
+    "AccountsWidget": ".accounts.list",
 
-from .settings import SettingsWindow
\ No newline at end of file
+    "SettingsWindow": ".settings",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
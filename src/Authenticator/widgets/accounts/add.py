@@ -16,13 +16,15 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
-from gettext import gettext as _
-from gi.repository import Gdk, Gtk, GObject, Gio, Handy
+from gettext import gettext as _, ngettext
+from threading import Thread
+
+from gi.repository import Gdk, Gtk, GObject, Gio, GLib, Handy
 
 from .list import AccountsWidget
 from Authenticator.widgets.notification import Notification
 from Authenticator.widgets.provider_image import ProviderImage, ProviderImageState
-from Authenticator.models import AccountsManager, Account, OTP, Provider, QRReader, GNOMEScreenshot
+from Authenticator.models import AccountsManager, Account, Logger, OTP, Provider
 
 
 @Gtk.Template(resource_path='/com/github/bilelmoussaoui/Authenticator/account_add.ui')
@@ -46,8 +48,12 @@ class AddAccountWindow(Gtk.Window):
         """Create the Add Account widgets."""
         self.account_config = AccountConfig()
         self.account_config.connect("changed", self._on_account_config_changed)
+        self.account_config.connect("accounts-scanned", self._on_accounts_scanned)
 
         self.scan_btn.connect("clicked", self.account_config.scan_qr)
+        self.account_config.bind_property("scanning", self.scan_btn, "sensitive",
+                                          GObject.BindingFlags.SYNC_CREATE
+                                          | GObject.BindingFlags.INVERT_BOOLEAN)
         self.back_btn.connect("clicked", lambda *_: self.destroy())
         self.column.add(self.account_config)
 
@@ -55,6 +61,26 @@ class AddAccountWindow(Gtk.Window):
         """Set the sensitivity of the AddButton depends on the AccountConfig."""
         self.add_btn.set_sensitive(state)
 
+    def _on_accounts_scanned(self, _, accounts: [dict]):
+        """Add all the accounts of a multi-accounts QR code at once."""
+        from Authenticator.models import Backup
+        parent = self.get_transient_for()
+
+        def on_added(added: [Account]):
+            skipped = len(accounts) - len(added)
+            message = ngettext("{} account added", "{} accounts added",
+                               len(added)).format(len(added))
+            if skipped:
+                message += ", " + ngettext("{} skipped, it already exists or is invalid",
+                                           "{} skipped, they already exist or are invalid",
+                                           skipped).format(skipped)
+            if parent:
+                parent.show_notification(message)
+
+        Backup.add_accounts([(account["username"], account["token"], account["provider"])
+                             for account in accounts], on_added)
+        self.destroy()
+
     @Gtk.Template.Callback('add_btn_clicked')
     def _on_add(self, *_):
         account_obj = self.account_config.account
@@ -77,9 +103,16 @@ class AccountConfig(Gtk.Overlay):
             GObject.SignalFlags.RUN_LAST,
             None, (bool,)
         ),
+        'accounts-scanned': (
+            GObject.SignalFlags.RUN_LAST,
+            None, (GObject.TYPE_PYOBJECT,)
+        ),
     }
     # Properties
     is_edit = GObject.Property(type=bool, default=False)
+    scanning = GObject.Property(type=bool, default=False)
+    # In ms, the favicon is fetched once the user stops typing the website
+    FAVICON_DELAY: int = 500
     # Widgets
     main_container: Gtk.Box = Gtk.Template.Child()
 
@@ -100,6 +133,8 @@ class AccountConfig(Gtk.Overlay):
         self.props.is_edit = kwargs.get("edit", False)
         self._account = kwargs.get("account", None)
         self._notification = Notification()
+        self._website = None
+        self._favicon_timeout_id = 0
         self.__init_widgets()
 
     @property
@@ -132,6 +167,12 @@ class AccountConfig(Gtk.Overlay):
 
     def __init_widgets(self):
         self.add_overlay(self._notification)
+        self._scan_spinner = Gtk.Spinner(halign=Gtk.Align.CENTER, valign=Gtk.Align.CENTER,
+                                         width_request=32, height_request=32,
+                                         no_show_all=True)
+        self.add_overlay(self._scan_spinner)
+        self.connect("notify::scanning", self.__on_scanning_changed)
+        self.connect("destroy", self.__on_destroy)
         if self._account is not None:
             self.provider_image = ProviderImage(self._account.provider,
                                                 96)
@@ -225,24 +266,81 @@ class AccountConfig(Gtk.Overlay):
 
     @Gtk.Template.Callback('on_provider_website_changed')
     def on_provider_website_changed(self, entry, event):
-        '''Update the website favicon once the URL is updated'''
-        if entry.get_visible():
-            website = entry.get_text().strip()
-            self.provider_image.fetch_favicon_from_url(website)
+        '''Update the website favicon once the user stops typing the URL'''
+        website = entry.get_text().strip()
+        if not entry.get_visible() or website == self._website:
+            return
+        self._website = website
+        # The favicon of the previous URL isn't needed anymore
+        self.provider_image.cancel_favicon_fetch()
+        if self._favicon_timeout_id > 0:
+            GLib.Source.remove(self._favicon_timeout_id)
+        self._favicon_timeout_id = GLib.timeout_add(AccountConfig.FAVICON_DELAY,
+                                                    self.__fetch_favicon, website)
+
+    def __fetch_favicon(self, website):
+        self._favicon_timeout_id = 0
+        self.provider_image.fetch_favicon_from_url(website)
+        return False
+
+    def __on_destroy(self, *_):
+        # Don't start a favicon lookup for a closed dialog
+        if self._favicon_timeout_id > 0:
+            GLib.Source.remove(self._favicon_timeout_id)
+            self._favicon_timeout_id = 0
 
     def scan_qr(self, *args):
-        '''Scans a QRCode and fills the entries with the correct data.'''
+        """
+            Scans a QRCode and fills the entries with the correct data.
+
+            The area selection & the decoding don't block the main loop,
+            the entries are filled once the QR code is decoded.
+        """
+        if self.props.scanning:
+            return
+        from Authenticator.models import GNOMEScreenshot
+        self.props.scanning = True
+        GNOMEScreenshot.area_bytes_async(self.__on_screenshot_taken)
+
+    def __on_screenshot_taken(self, capture: bytes):
+        if not capture:
+            self.props.scanning = False
+            return
+        Thread(target=self.__decode_qr, args=(capture, ),
+               name="QRReader", daemon=True).start()
+
+    def __decode_qr(self, capture: bytes):
+        # Runs on a worker thread
+        accounts = []
         try:
-            filename = GNOMEScreenshot.area()
-            assert filename
-            account = QRReader.from_file(filename)
-            assert account is dict
-            self.token_entry.set_text(account.get('token',
-                                                  self.token_entry.get_text()))
-            self.provider_entry.set_text(account.get('provider',
-                                                     self.provider_entry.get_text()))
-            self.account_name_entry.set_text(account.get('username',
-                                                         self.account_name_entry.get_text()))
-        except AssertionError:
+            from Authenticator.models import QRReader
+            accounts = QRReader.from_bytes(capture)
+        except Exception as error:
+            Logger.error("[QRReader] Couldn't decode the screenshot")
+            Logger.error(str(error))
+        GLib.idle_add(self.__on_qr_decoded, accounts)
+
+    def __on_qr_decoded(self, accounts: [dict]):
+        self.props.scanning = False
+        if len(accounts) > 1 and not self.props.is_edit:
+            # Several QR codes or an export of several accounts
+            self.emit("accounts-scanned", accounts)
+        elif accounts:
+            account = accounts[0]
+            self.token_entry.set_text(account.get('token') or self.token_entry.get_text())
+            self.provider_entry.set_text(account.get('provider') or self.provider_entry.get_text())
+            self.account_name_entry.set_text(account.get('username')
+                                             or self.account_name_entry.get_text())
+        else:
             self._notification.send(_("Invalid QR code"),
                                     timeout=3)
+        return False
+
+    def __on_scanning_changed(self, *_):
+        scanning = self.props.scanning
+        self.main_container.set_sensitive(not scanning)
+        self._scan_spinner.set_visible(scanning)
+        if scanning:
+            self._scan_spinner.start()
+        else:
+            self._scan_spinner.stop()
@@ -16,12 +16,14 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
+from bisect import bisect_right
+from collections import OrderedDict
 from gettext import gettext as _
-from gi.repository import Gtk, GObject
+from gi.repository import Gtk, GObject, Gio, GLib
 
 from Authenticator.widgets.provider_image import ProviderImage
 from .row import AccountRow
-from Authenticator.models import Account, AccountsManager, Provider
+from Authenticator.models import Account, AccountsManager, AccountsSnapshot, Database, DatabaseMonitor, Provider, Tracer, Usage
 
 
 @Gtk.Template(resource_path='/com/github/bilelmoussaoui/Authenticator/accounts_widget.ui')
@@ -31,50 +33,181 @@ class AccountsWidget(Gtk.Box):
     __gsignals__ = {
         'account-removed': (GObject.SignalFlags.RUN_LAST, None, ()),
         'account-added': (GObject.SignalFlags.RUN_LAST, None, ()),
+        'accounts-loaded': (GObject.SignalFlags.RUN_LAST, None, ()),
     }
 
     instance: 'AccountsWidget' = None
+    # Number of rows created up front, then each time the view
+    # is scrolled near the last row
+    ROWS_PAGE: int = 50
 
     accounts_container = Gtk.Template.Child()
     otp_progress_bar = Gtk.Template.Child()
+    scrolled_window = Gtk.Template.Child()
 
     def __init__(self):
         super(AccountsWidget, self).__init__()
         self.init_template('AccountsWidget')
 
-        self._providers = []
+        # provider id: (ProviderWidget, AccountsList)
+        self._providers = OrderedDict()
+        # account id: the AccountsList it belongs to
+        self._accounts_lists = {}
         self._to_delete = []
+        self._ranked = False
+        # The current search query, normalized
+        self._query = ""
+        # The number of rows the lists can create, in the display order
+        self._rows_budget = AccountsWidget.ROWS_PAGE
+        # The number of matching accounts without a row yet
+        self._rows_missing = 0
+        self._rows_source_id = 0
+        # The most recent use known by the accounts
+        self._last_used = 0
+        self.is_loaded = False
         self.__init_widgets()
 
+    @Tracer.trace("AccountsWidget.init_widgets")
     def __init_widgets(self):
+        vadjustment = self.scrolled_window.get_vadjustment()
+        vadjustment.connect("value-changed", self.__on_scrolled)
+        vadjustment.connect("changed", self.__on_scrolled)
+        # Render the last known accounts list right away and load
+        # the database & the secrets once the window is drawn
+        snapshot = AccountsSnapshot.load()
+        if snapshot:
+            self.append_many([account for _, accounts in snapshot for account in accounts])
+            GLib.idle_add(self.__load_accounts)
+        else:
+            self.__load_accounts()
+
+    @Tracer.trace("AccountsWidget.populate")
+    def __load_accounts(self):
         accounts_manager = AccountsManager.get_default()
         accounts_manager.connect("counter_updated",
                                  self._on_counter_updated)
+        accounts_manager.connect("codes_updated", self.__on_codes_updated)
+        # Placeholder accounts created from the snapshot
+        placeholders = {}
+        for accounts_list in self.accounts_lists:
+            for account in accounts_list.accounts:
+                placeholders[account.id] = (accounts_list, account)
+
         # Add different accounts to the main view
+        new_accounts = []
+        replaced = OrderedDict()
         for provider, accounts in accounts_manager.accounts_per_provider:
             for account in accounts:
-                self.append(account)
+                accounts_list, placeholder = placeholders.pop(account.id, (None, None))
+                if placeholder and self.__is_same_provider(placeholder.provider, provider):
+                    replaced.setdefault(accounts_list, []).append(account)
+                    continue
+                if placeholder:
+                    self.__remove_account(accounts_list, placeholder)
+                new_accounts.append(account)
+        for accounts_list, accounts in replaced.items():
+            accounts_list.replace_accounts(accounts)
+        # Accounts that were removed since the snapshot was saved
+        for accounts_list, placeholder in placeholders.values():
+            self.__remove_account(accounts_list, placeholder)
+        self.append_many(new_accounts)
+
+        self.is_loaded = True
+        self.emit("accounts-loaded")
+        self._last_used = Database.get_default().last_used
+        DatabaseMonitor.get_default().connect("changed", self.__on_database_changed)
+        return False
+
+    def __on_database_changed(self, _, changes):
+        """Reload the accounts another process changed."""
+        database = Database.get_default()
+        accounts_manager = AccountsManager.get_default()
+        self.__reload_usage(database)
+        if changes is None:
+            account_ids = set(self._accounts_lists) | {account.id for account in database.accounts}
+            provider_ids = set(self._providers)
+        else:
+            account_ids = changes["accounts"]
+            provider_ids = changes["providers"]
+
+        for provider_id in provider_ids:
+            provider = Provider.get_by_id(provider_id)
+            if provider_id in self._providers and provider:
+                provider_widget, _ = self._providers[provider_id]
+                provider_widget.set_provider(provider)
+
+        db_accounts = {obj.id: obj for obj in database.accounts_by_ids(account_ids)}
+        new_accounts = []
+        for account_id in account_ids:
+            obj = db_accounts.get(account_id)
+            accounts_list = self._accounts_lists.get(account_id)
+            account = accounts_list.get_account(account_id) if accounts_list else None
+            if account and not obj:
+                accounts_manager.delete(account)
+                self.__remove_account(accounts_list, account)
+                self.emit("account-removed")
+            elif obj and not account:
+                account = Account(*obj)
+                if account.has_secret:
+                    accounts_manager.add(account.provider, account)
+                    new_accounts.append(account)
+            elif obj:
+                if obj.username != account.username:
+                    account.username = obj.username
+                    accounts_list.refresh_account(account)
+                if obj.provider != account.provider.provider_id:
+                    self.update_provider(account, Provider.get_by_id(obj.provider))
+        self.append_many(new_accounts)
+
+    def __reload_usage(self, database):
+        """Update the ranks of the accounts another process used, e.g. the search provider."""
+        changed_lists = set()
+        # The uses are written up to FLUSH_DELAY after they happened
+        for account_id, last_used, usage_rank in database.usage_since(self._last_used - Usage.FLUSH_DELAY):
+            self._last_used = max(self._last_used, last_used)
+            accounts_list = self._accounts_lists.get(account_id)
+            account = accounts_list.get_account(account_id) if accounts_list else None
+            if account and account.usage_rank != usage_rank:
+                account.last_used = last_used
+                account.usage_rank = usage_rank
+                changed_lists.add(accounts_list)
+        if changed_lists and self._ranked:
+            for accounts_list in changed_lists:
+                accounts_list.set_ranked(True)
+            self._reorder()
+
+    @staticmethod
+    def __is_same_provider(provider, other_provider) -> bool:
+        return (provider.provider_id == other_provider.provider_id
+                and provider.name == other_provider.name
+                and provider.image == other_provider.image)
+
+    def __remove_account(self, accounts_list, account):
+        accounts_list.remove_account(account)
+        self._accounts_lists.pop(account.id, None)
+        if accounts_list.is_empty:
+            self._to_delete.append(accounts_list)
+        self._clean_unneeded_providers_widgets()
+        self.__apply_rows_budget()
 
     def __add_provider(self, provider):
-        accounts_list = self._get_by_provider(provider)["accounts_list"]
-        if not accounts_list:
+        if provider.provider_id in self._providers:
+            _, accounts_list = self._providers[provider.provider_id]
+        else:
             accounts_list = AccountsList()
+            accounts_list.filter(self._query)
             accounts_list.connect("account-deleted", self._on_account_deleted)
-            self._providers.append({"provider": provider,
-                                    "accounts_list": accounts_list})
             provider_widget = ProviderWidget(accounts_list, provider)
+            self._providers[provider.provider_id] = (provider_widget, accounts_list)
             self.accounts_container.pack_start(provider_widget, False, False, 0)
+            if not self._ranked:
+                # Insert it at its place, the providers are sorted by name
+                names = [child.provider.name.lower()
+                         for child in self.accounts_container.get_children()[:-1]]
+                self.accounts_container.reorder_child(provider_widget,
+                                                      bisect_right(names, provider.name.lower()))
         return accounts_list
 
-    def _get_by_provider(self, provider):
-        for provider_info in self._providers:
-            if provider.provider_id == provider_info['provider'].provider_id:
-                return provider_info
-        return {
-            'provider': None,
-            'accounts_list': None
-        }
-
     @staticmethod
     def get_default() -> 'AccountsWidget':
         """Return the default instance of AccountsWidget."""
@@ -83,37 +216,84 @@ class AccountsWidget(Gtk.Box):
         return AccountsWidget.instance
 
     def append(self, account):
-        accounts_list = self.__add_provider(account.provider)
-        accounts_list.add_row(account)
+        self.append_many([account])
 
-        self._reorder()
+    def append_many(self, accounts: [Account]):
+        """
+            Add several accounts at once, on startup or when importing a backup.
+
+            Each provider list gets its accounts in a single model change
+            and the widgets are shown once at the end.
+
+            :param accounts: the accounts to add
+        """
+        accounts_per_provider = OrderedDict()
+        for account in accounts:
+            accounts_per_provider.setdefault(account.provider.provider_id, []).append(account)
+        if not accounts_per_provider:
+            return
+        for provider_accounts in accounts_per_provider.values():
+            accounts_list = self.__add_provider(provider_accounts[0].provider)
+            accounts_list.add_rows(provider_accounts)
+            for account in provider_accounts:
+                self._accounts_lists[account.id] = accounts_list
+        if self._ranked:
+            self._reorder()
+        else:
+            self.__apply_rows_budget()
+        self.show_all()
         self.emit("account-added")
 
+    @property
+    def is_empty(self) -> bool:
+        return len(self._providers) == 0
+
     @property
     def accounts_lists(self):
-        return [provider['accounts_list'] for provider in self._providers]
+        return [accounts_list for _, accounts_list in self._providers.values()]
+
+    def filter(self, query: str) -> int:
+        """
+            Show only the accounts matching a search query.
+
+            :param query: the search query, empty to show all the accounts
+            :return: the number of visible accounts
+        """
+        query = query.casefold()
+        # A longer query can only hide accounts, only the visible ones are tested
+        narrowing = bool(self._query) and self._query in query
+        self._query = query
+        self._rows_budget = AccountsWidget.ROWS_PAGE
+        results_count = sum(accounts_list.filter(query, narrowing)
+                            for accounts_list in self.accounts_lists)
+        self.__apply_rows_budget()
+        return results_count
+
+    def set_ranked(self, ranked: bool):
+        """
+            Show the most used accounts & providers first.
+
+            :param ranked: whether to sort by usage or by name
+        """
+        if ranked == self._ranked:
+            return
+        self._ranked = ranked
+        for accounts_list in self.accounts_lists:
+            accounts_list.set_ranked(ranked)
+        self._reorder()
 
     def update_provider_image(self, provider):
-        for child in self.accounts_container.get_children():
-            if child.provider.provider_id == provider.provider_id:
-                child.provider_image.set_image(provider.image)
-                break
+        if provider.provider_id in self._providers:
+            provider_widget, _ = self._providers[provider.provider_id]
+            provider_widget.provider_image.set_image(provider.image)
 
     def update_provider(self, account, new_provider):
-        current_account_list = None
-        account_row = None
-        for account_list in self.accounts_lists:
-            for account_row in account_list:
-                if account_row.account == account:
-                    current_account_list = account_list
-                    break
-
-            if current_account_list:
-                break
-        if account_row:
-            current_account_list.remove(account_row)
-            account_row.account.provider = new_provider
-            self.append(account_row.account)
+        current_account_list = self._accounts_lists.get(account.id)
+        if not current_account_list:
+            return
+        current_account_list.remove_account(account)
+        account.provider = new_provider
+        self.append(account)
         self._on_account_deleted(current_account_list, None)
         self._reorder()
         self._clean_unneeded_providers_widgets()
@@ -121,7 +301,8 @@ class AccountsWidget(Gtk.Box):
     def _on_account_deleted(self, accounts_list, account=None):
         if account:
             AccountsManager.get_default().delete(account)
-        if len(accounts_list.get_children()) == 0:
+            self._accounts_lists.pop(account.id, None)
+        if accounts_list.is_empty:
             self._to_delete.append(accounts_list)
         self._reorder()
         self._clean_unneeded_providers_widgets()
@@ -131,7 +312,7 @@ class AccountsWidget(Gtk.Box):
         for accounts_list in self._to_delete:
             provider_widget = accounts_list.get_parent()
             self.accounts_container.remove(provider_widget)
-            self._providers.remove(self._get_by_provider(provider_widget.provider))
+            self._providers.pop(provider_widget.provider.provider_id, None)
         self._to_delete = []
 
     def _reorder(self):
@@ -139,11 +320,55 @@ class AccountsWidget(Gtk.Box):
             Re-order the ProviderWidget on AccountsWidget.
         """
         childs = self.accounts_container.get_children()
-        ordered_childs = sorted(
-            childs, key=lambda children: children.provider.name.lower())
+        if self._ranked:
+            ordered_childs = sorted(
+                childs, key=lambda children: (-children.accounts_list.usage_rank,
+                                              children.provider.name.lower()))
+        else:
+            ordered_childs = sorted(
+                childs, key=lambda children: children.provider.name.lower())
         for i in range(len(ordered_childs)):
             self.accounts_container.reorder_child(ordered_childs[i], i)
-        self.show_all()
+        self.__apply_rows_budget()
+
+    def __apply_rows_budget(self):
+        """
+            Share the rows budget between the lists, in the display order.
+
+            The providers whose accounts all come after the budget are
+            hidden until the view is scrolled down to them.
+        """
+        remaining = self._rows_budget
+        self._rows_missing = 0
+        for provider_widget in self.accounts_container.get_children():
+            accounts_list = provider_widget.accounts_list
+            shown = accounts_list.set_rows_limit(remaining)
+            remaining -= shown
+            self._rows_missing += accounts_list.results_count - shown
+            hidden = shown == 0 and accounts_list.results_count > 0
+            if hidden == provider_widget.get_visible():
+                provider_widget.set_no_show_all(hidden)
+                if hidden:
+                    provider_widget.hide()
+                else:
+                    provider_widget.show_all()
+
+    def __on_scrolled(self, adjustment):
+        # Create the next rows once less than a page is left below the view
+        end = adjustment.get_upper() - adjustment.get_page_size()
+        if (self._rows_missing > 0 and self._rows_source_id == 0
+                and adjustment.get_value() >= end - adjustment.get_page_size()):
+            self._rows_source_id = GLib.idle_add(self.__on_more_rows)
+
+    def __on_more_rows(self):
+        self._rows_source_id = 0
+        self._rows_budget += AccountsWidget.ROWS_PAGE
+        self.__apply_rows_budget()
+        return False
+
+    def __on_codes_updated(self, _, codes):
+        for accounts_list in self.accounts_lists:
+            accounts_list.update_codes(codes)
 
     def _on_counter_updated(self, accounts_manager, counter):
         counter_fraction = counter / accounts_manager.counter_max
@@ -165,33 +390,44 @@ class ProviderWidget(Gtk.Box):
         self.set_valign(Gtk.Align.START)
 
         provider_container = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
-        provider_lbl = Gtk.Label()
-        provider_lbl.set_text(self.provider.name)
-        provider_lbl.set_halign(Gtk.Align.START)
-        provider_lbl.get_style_context().add_class("provider-name")
+        self.provider_lbl = Gtk.Label()
+        self.provider_lbl.set_text(self.provider.name)
+        self.provider_lbl.set_halign(Gtk.Align.START)
+        self.provider_lbl.get_style_context().add_class("provider-name")
 
-        self.provider_image = ProviderImage(self.provider, 48)
+        self.provider_image = ProviderImage(self.provider, 48, lazy=True)
 
         provider_container.pack_start(self.provider_image, False, False, 6)
-        provider_container.pack_start(provider_lbl, False, False, 6)
+        provider_container.pack_start(self.provider_lbl, False, False, 6)
 
         self.pack_start(provider_container, False, False, 6)
         self.pack_start(self.accounts_list, False, False, 6)
 
+    def set_provider(self, provider: Provider):
+        """Update the provider name & image after it was changed."""
+        self.provider.name = provider.name
+        self.provider.image = provider.image
+        self.provider_lbl.set_text(provider.name)
+        if provider.image:
+            self.provider_image.set_image(provider.image)
+
 
 class AccountsList(Gtk.ListBox):
-    """Accounts List."""
+    """
+        Accounts List.
+
+        The rows are bound to an AccountsModel of the accounts matching
+        the current search query: the filtered out accounts don't have
+        a row and are not rendered at all. Only the first accounts of the
+        model get a row, the AccountsWidget raises the limit as the view
+        is scrolled down.
+    """
 
     __gsignals__ = {
         'account-deleted': (
             GObject.SignalFlags.RUN_LAST,
             None,
-            (Account, )
-        ),
-        'account-added': (
-            GObject.SignalFlags.RUN_LAST,
-            None,
-            (Account, )
+            (GObject.TYPE_PYOBJECT, )
         )
     }
 
@@ -201,16 +437,187 @@ class AccountsList(Gtk.ListBox):
         self.get_style_context().add_class("accounts-list")
         self.get_style_context().add_class("frame")
         self.set_header_func(self._update_header_func)
+        # account id: account, all the accounts of the provider
+        self._accounts = OrderedDict()
+        # account id: row, only the shown accounts have a row
+        self._rows = {}
+        self._query = ""
+        self._ranked = False
+        self.model = AccountsModel()
+        self.bind_model(self.model, self.__create_row)
+
+    @property
+    def accounts(self) -> [Account]:
+        return list(self._accounts.values())
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self._accounts) == 0
+
+    @property
+    def usage_rank(self) -> float:
+        """The rank of the most used account."""
+        return max((account.usage_rank for account in self._accounts.values()), default=0.0)
+
+    def get_account(self, account_id: int) -> Account:
+        return self._accounts.get(account_id)
 
     def add_row(self, account: Account):
-        row = AccountRow(account)
+        self.add_rows([account])
+
+    def add_rows(self, accounts: [Account]):
+        for account in accounts:
+            self._accounts[account.id] = account
+        accounts_matching = [account for account in accounts
+                             if self.__match(account, self._query)]
+        if self._ranked:
+            for account in accounts_matching:
+                self.model.insert_sorted(account, key=lambda account_: -account_.usage_rank)
+        else:
+            self.model.splice(len(self.model), 0, accounts_matching)
+
+    def remove_account(self, account: Account):
+        del self._accounts[account.id]
+        position = self.__find(account)
+        if position is not None:
+            self.model.remove(position)
+
+    @property
+    def results_count(self) -> int:
+        """The number of accounts matching the search query."""
+        return len(self.model)
+
+    def set_rows_limit(self, limit: int) -> int:
+        """
+            Only create the rows of the first accounts.
+
+            :param limit: the maximum number of rows
+            :return: the number of rows
+        """
+        return self.model.set_limit(limit)
+
+    def replace_accounts(self, accounts: [Account]):
+        """
+            Replace accounts by new ones with the same ids,
+            e.g. the placeholders by the real accounts.
+        """
+        for account in accounts:
+            self._accounts[account.id] = account
+        self.model.splice(0, len(self.model),
+                          [account for account in self.__sorted(self._accounts.values())
+                           if self.__match(account, self._query)])
+
+    def refresh_account(self, account: Account):
+        """
+            Re-create the row of an account after it was modified.
+        """
+        self.__update_row(self.__find(account), account)
+
+    def update_codes(self, codes: dict):
+        """
+            Update the OTPs shown, the accounts without a row are skipped.
+
+            :param codes: account id: its new OTP
+        """
+        for account_id, row in self._rows.items():
+            pin = codes.get(account_id)
+            if pin:
+                row.set_pin(pin)
+
+    def filter(self, query: str, narrowing: bool = False) -> int:
+        """
+            Filter the accounts with a normalized search query.
+
+            :param query: the search query
+            :param narrowing: whether the query only narrows down the previous one
+            :return: the number of visible accounts
+        """
+        self._query = query
+        if narrowing:
+            candidates = list(self.model)
+        else:
+            candidates = self.__sorted(self._accounts.values())
+        accounts = [account for account in candidates if self.__match(account, query)]
+        self.__set_visible(accounts)
+        return len(accounts)
+
+    def set_ranked(self, ranked: bool):
+        self._ranked = ranked
+        accounts = [account for account in self.__sorted(self._accounts.values())
+                    if self.__match(account, self._query)]
+        self.model.splice(0, len(self.model), accounts)
+
+    def __sorted(self, accounts: [Account]) -> [Account]:
+        if self._ranked:
+            return sorted(accounts, key=lambda account: -account.usage_rank)
+        return list(accounts)
+
+    def __set_visible(self, accounts: [Account]):
+        """
+            Update the model with the least changes, the existing rows are kept.
+
+            Falls back to replacing all the rows if the model isn't
+            in the same order as the accounts anymore.
+        """
+        visible = set(accounts)
+        shown = set(self.model)
+        position = 0
+        for account in accounts:
+            while (position < len(self.model)
+                   and self.model[position] not in visible):
+                self.model.remove(position)
+            if (position >= len(self.model)
+                    or self.model[position] != account):
+                if account in shown:
+                    self.model.splice(0, len(self.model), accounts)
+                    return
+                self.model.insert(position, account)
+            position += 1
+        n_items = len(self.model)
+        if position < n_items:
+            self.model.splice(position, n_items - position, [])
+
+    def __update_row(self, position, account: Account):
+        matches = self.__match(account, self._query)
+        if position is None:
+            if matches:
+                self.filter(self._query)
+        elif matches:
+            self.model.splice(position, 1, [account])
+        else:
+            self.model.remove(position)
+
+    def __find(self, account: Account):
+        """
+            Find the position of an account in the model.
+
+            The rows are bound to the model, a row index is its item position.
+            The accounts past the rows limit don't have a row yet.
+        """
+        row = self._rows.get(account.id)
+        if row and row.account == account:
+            return row.get_index()
+        return self.model.index(account)
+
+    @staticmethod
+    def __match(account: Account, query: str) -> bool:
+        return not query or any(query in search_key for search_key in account.search_keys)
+
+    def __create_row(self, item: 'AccountItem'):
+        row = AccountRow(item.account)
         row.delete_btn.connect("clicked", self.__on_delete_child, row)
-        self.add(row)
-        self.emit("account-added", account)
+        row.connect("destroy", self.__on_row_destroyed)
+        self._rows[item.account.id] = row
+        return row
+
+    def __on_row_destroyed(self, row):
+        # The row of a removed account or the previous row of a re-created one
+        if self._rows.get(row.account.id) is row:
+            del self._rows[row.account.id]
 
     def __on_delete_child(self, _, account_row):
-        self.remove(account_row)
         account = account_row.account
+        self.remove_account(account)
         account.remove()
         self.emit("account-deleted", account)
 
@@ -223,3 +630,103 @@ class AccountsList(Gtk.ListBox):
             separator.connect("realize", on_realize_sep)
             row.set_header(separator)
             separator.show()
+
+
+class AccountItem(GObject.Object):
+    """The short-lived GObject an AccountsModel returns to the ListBox."""
+
+    def __init__(self, account: Account):
+        GObject.Object.__init__(self)
+        self.account = account
+
+
+class AccountsModel(GObject.Object, Gio.ListModel):
+    """
+        A Gio.ListModel of accounts.
+
+        The accounts are plain Python records, a GObject is only created
+        when the ListBox asks for an item to create its row. Only the
+        first accounts, up to the limit, are exposed to the ListBox.
+    """
+
+    def __init__(self):
+        GObject.Object.__init__(self)
+        self._accounts = []
+        self._limit = None
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __getitem__(self, position: int) -> Account:
+        return self._accounts[position]
+
+    def __iter__(self):
+        return iter(self._accounts)
+
+    def do_get_item_type(self):
+        return AccountItem.__gtype__
+
+    @property
+    def n_exposed(self) -> int:
+        """The number of accounts exposed to the ListBox."""
+        if self._limit is None:
+            return len(self._accounts)
+        return min(len(self._accounts), self._limit)
+
+    def do_get_n_items(self) -> int:
+        return self.n_exposed
+
+    def do_get_item(self, position: int):
+        if position < self.n_exposed:
+            return AccountItem(self._accounts[position])
+        return None
+
+    def set_limit(self, limit: int) -> int:
+        """
+            Change the number of accounts exposed to the ListBox.
+
+            :param limit: the maximum number of exposed accounts
+            :return: the number of exposed accounts
+        """
+        exposed = self.n_exposed
+        self._limit = limit
+        new_exposed = self.n_exposed
+        if new_exposed > exposed:
+            self.items_changed(exposed, 0, new_exposed - exposed)
+        elif new_exposed < exposed:
+            self.items_changed(new_exposed, exposed - new_exposed, 0)
+        return new_exposed
+
+    def index(self, account: Account):
+        try:
+            return self._accounts.index(account)
+        except ValueError:
+            return None
+
+    def splice(self, position: int, n_removals: int, accounts: [Account]):
+        exposed = self.n_exposed
+        self._accounts[position:position + n_removals] = accounts
+        new_exposed = self.n_exposed
+        # The changes past the exposed accounts aren't seen by the ListBox
+        if position > exposed:
+            return
+        removed = min(position + n_removals, exposed) - position
+        added = min(position + len(accounts), new_exposed) - position
+        if removed or added:
+            self.items_changed(position, removed, added)
+        # The following accounts moved in or out of the exposed ones
+        missing = new_exposed - (exposed - removed + added)
+        if missing > 0:
+            self.items_changed(new_exposed - missing, 0, missing)
+        elif missing < 0:
+            self.items_changed(new_exposed, -missing, 0)
+
+    def insert(self, position: int, account: Account):
+        self.splice(position, 0, [account])
+
+    def insert_sorted(self, account: Account, key):
+        keys = [key(account_) for account_ in self._accounts]
+        self.insert(bisect_right(keys, key(account)), account)
+
+    def remove(self, position: int):
+        self.splice(position, 1, [])
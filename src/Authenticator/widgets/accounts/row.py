@@ -27,7 +27,7 @@ class AccountRow(Gtk.ListBoxRow):
         AccountRow Widget.
 
         It's a subclass of Gtk.ListBoxRow
-        Added as a child to a AccountsList
+        Created by an AccountsList for the accounts it shows
 
         @signals: None
         @properties: account
@@ -62,10 +62,8 @@ class AccountRow(Gtk.ListBoxRow):
         """
         super(AccountRow, self).__init__()
         self.init_template('AccountRow')
-        self._account = account
-
-        self._account.connect("otp_updated", self._on_pin_updated)
-        self.__init_widgets()
+        self._account = None
+        self.account = account
 
     @property
     def account(self):
@@ -76,15 +74,30 @@ class AccountRow(Gtk.ListBoxRow):
         """
         return self._account
 
+    @account.setter
+    def account(self, account):
+        """
+            Assign a new Account model to this AccountRow.
+
+            Used to replace a placeholder account once the real one is loaded.
+        """
+        self._account = account
+        self.__init_widgets()
+
     def __init_widgets(self):
         # Set up account name text label
         self.account_name_label.set_text(self.account.username)
         self.account_name_label.set_tooltip_text(self.account.username)
 
+        # Placeholders can't be copied/edited until the secret is loaded
+        self.set_sensitive(not self.account.is_placeholder)
+        self.pin_label.set_tooltip_text(None)
         # Set up account pin text label
-        pin = self.account.otp.pin
+        pin = self.account.pin
         if pin:
             self.pin_label.set_text(pin)
+        elif self.account.is_placeholder:
+            self.pin_label.set_text("······")
         else:
             self.pin_label.set_text("??????")
             self.pin_label.set_tooltip_text(_("Couldn't generate the secret code"))
@@ -140,10 +153,9 @@ class AccountRow(Gtk.ListBoxRow):
         self.account.update(account_name, provider)
         self.emit("account-updated", _("The account was updated successfully"))
 
-    def _on_pin_updated(self, _, pin: str):
+    def set_pin(self, pin: str):
         """
             Updates the pin label each time a new OTP is generated.
-            otp_updated signal handler.
 
             :param pin: the new OTP
             :type pin: str
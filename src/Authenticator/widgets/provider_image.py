@@ -19,13 +19,8 @@
 
 from gi.repository import Gtk, GObject, GdkPixbuf, GLib, Gio
 from os import path
-from pathlib import Path
 from enum import Enum
-from tempfile import NamedTemporaryFile
-import asyncio
-from pyfavicon import Favicon
-import concurrent
-from Authenticator.models import Provider
+from Authenticator.models import FaviconCache, FaviconFetcher, Logger, PixbufCache, Provider, ProviderIcons
 
 
 class ProviderImageState(Enum):
@@ -74,14 +69,26 @@ class ProviderImage(Gtk.Stack):
     not_found_box = Gtk.Template.Child()
 
     _timeout_id = 0
-    CACHE_DIR = path.join(GLib.get_user_cache_dir(), "Authenticator")
+    CACHE_DIR = Provider.CACHE_DIR
 
-    def __init__(self, provider=None, image_size=48):
+    def __init__(self, provider=None, image_size=48, lazy=False):
+        """
+        :param provider: Provider
+        :param image_size: the image size in pixels
+        :param lazy: only load the image once the widget is drawn,
+                     for the images of a long scrolled list
+        """
         super(ProviderImage, self).__init__()
         self.init_template('ProviderImage')
         self.provider = provider if provider else Provider()
 
         self.image_size = image_size
+        self._lazy = lazy
+        self._draw_id = 0
+        # The favicon download being waited for: (website, callback)
+        self._favicon_request = None
+        # The last image set, the images are loaded asynchronously
+        self._image = None
 
         self._build_widget()
 
@@ -92,6 +99,7 @@ class ProviderImage(Gtk.Stack):
         self.provider_image.set_pixel_size(self.image_size)
 
         self.connect("provider-changed", self.__on_provider_changed)
+        self.connect("destroy", lambda *_: self.cancel_favicon_fetch())
 
         def set_show_insert_image(state):
             if state != self.insert_image.get_visible():
@@ -103,9 +111,25 @@ class ProviderImage(Gtk.Stack):
         self.image_eventbox.connect("leave-notify-event",
                                     lambda *_: set_show_insert_image(False))
 
-        if self.provider.image:
-            if not self.set_image(self.provider.image) and self.provider.website:
-                self.fetch_favicon_from_url(self.provider.website)
+        if self.provider.image or ProviderIcons.get_default().has_icon(self.provider.name):
+            if self._lazy:
+                self._draw_id = self.connect("draw", self.__on_first_draw)
+            else:
+                self.__load_image()
+
+    def __load_image(self):
+        if self.set_image(self.provider.image):
+            return False
+        if not self.__set_catalog_icon(self.provider) and self.provider.website:
+            self.fetch_favicon_from_url(self.provider.website)
+        return False
+
+    def __on_first_draw(self, *_):
+        # The widgets scrolled out of the view are not drawn
+        self.disconnect(self._draw_id)
+        self._draw_id = 0
+        GLib.idle_add(self.__load_image)
+        return False
 
     def set_state(self, state: ProviderImageState):
         self.state = state
@@ -121,18 +145,52 @@ class ProviderImage(Gtk.Stack):
             return self.provider.image
         return None
 
-    def set_image(self, image):
-        try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(image)
-            pixbuf = pixbuf.scale_simple(self.image_size, self.image_size,
-                                         GdkPixbuf.InterpType.BILINEAR)
+    def set_image(self, image) -> bool:
+        """
+            Show an image, it's decoded in the background if it isn't cached.
+
+            :param image: the image path
+            :return: whether the image file exists
+        """
+        self._image = image
+        if not image or not path.exists(image):
+            self.set_state(ProviderImageState.NOT_FOUND)
+            return False
+        FaviconCache.get_default().touch(image)
+        pixbuf_cache = PixbufCache.get_default()
+        pixbuf = pixbuf_cache.lookup(image, self.image_size)
+        if pixbuf:
+            self.__on_image_loaded(image, pixbuf)
+        else:
+            pixbuf_cache.load(image, self.image_size,
+                              lambda pixbuf: self.__on_image_loaded(image, pixbuf))
+        return True
+
+    def __set_catalog_icon(self, provider) -> bool:
+        """
+            Show the icon packed in the application for a catalog provider.
+
+            :param provider: the provider
+            :return: whether the catalog has an icon for it
+        """
+        pixbuf = ProviderIcons.get_default().lookup(provider.name, self.image_size)
+        if pixbuf is None:
+            return False
+        self.cancel_favicon_fetch()
+        self._image = None
+        self.provider_image.set_from_pixbuf(pixbuf)
+        self.set_state(ProviderImageState.FOUND)
+        return True
+
+    def __on_image_loaded(self, image, pixbuf: GdkPixbuf.Pixbuf):
+        # Another image was set in the meantime
+        if image != self._image:
+            return
+        if pixbuf:
             self.provider_image.set_from_pixbuf(pixbuf)
             self.set_state(ProviderImageState.FOUND)
-            return True
-        except GLib.Error:
-            pass
-        self.set_state(ProviderImageState.NOT_FOUND)
-        return False
+        else:
+            self.set_state(ProviderImageState.NOT_FOUND)
 
     # Callbacks
     @Gtk.Template.Callback('select_image_clicked')
@@ -153,7 +211,8 @@ class ProviderImage(Gtk.Stack):
         if dialog.run() == Gtk.ResponseType.ACCEPT:
             file_uri = dialog.get_uri()
             cache_file = self.__create_cache_file(file_uri)
-            self.set_image(cache_file)
+            if cache_file:
+                self.set_image(cache_file)
         dialog.destroy()
 
     # Signals
@@ -165,57 +224,53 @@ class ProviderImage(Gtk.Stack):
         if provider.image:  # If we have already an image in the database
             if path.exists(provider.image):
                 self.set_image(provider.image)
+            elif self.__set_catalog_icon(provider):
+                pass
             elif provider.website:
                 self.fetch_favicon_from_url(provider.website)
             else:
                 self.provider.update(image=None)
                 self.set_state(ProviderImageState.NOT_FOUND)
+        elif self.__set_catalog_icon(provider):  # If it's shipped with the application
+            pass
         elif provider.website:  # If we can download a favicon
             self.fetch_favicon_from_url(provider.website)
         else:
             self.set_state(ProviderImageState.NOT_FOUND)
 
     def fetch_favicon_from_url(self, provider_website):
+        # Only the last requested website matters
+        self.cancel_favicon_fetch()
         if provider_website:
-            worker_loop = asyncio.new_event_loop()
-            pool = concurrent.futures.ThreadPoolExecutor()
             current_provider = self.provider
-            pool.submit(self._download_favicon, worker_loop, provider_website,
-                        current_provider)
 
-    # Private
-    def _download_favicon(self, loop, provider_website, current_provider):
-        cache_dir = Path(ProviderImage.CACHE_DIR)
-        if not cache_dir.exists():
-            cache_dir.mkdir()
-
-        async def fetch_favicon():
-            favicon = Favicon(download_dir=cache_dir)
-            icons = await favicon.from_url(provider_website)
-            largest_icon = icons.get_largest()
-            if largest_icon:
-                await largest_icon.save()
-                GLib.idle_add(self.emit, "image-downloaded", largest_icon.path,
-                              current_provider)
-            else:
-                self.set_state(ProviderImageState.NOT_FOUND)
-        # Hackish solution for https://github.com/python/cpython/pull/13548
-        loop.set_exception_handler(lambda loop, ctx: None)
-        loop.run_until_complete(fetch_favicon())
+            def on_downloaded(image_path):
+                self._favicon_request = None
+                self.emit("image-downloaded", image_path, current_provider)
+
+            self._favicon_request = (provider_website, on_downloaded)
+            FaviconFetcher.get_default().fetch(provider_website, on_downloaded)
 
+    def cancel_favicon_fetch(self):
+        """Stop waiting for the favicon being downloaded, if any."""
+        if self._favicon_request:
+            FaviconFetcher.get_default().cancel(*self._favicon_request)
+            self._favicon_request = None
+
+    # Private
     def __create_cache_file(self, file_uri):
         """
             Store a copy of the image under the cache dir of Authenticator.
         """
         gfile = Gio.File.new_for_uri(file_uri)
-        # Copy file to cache dir
-        cache_filename = path.basename(NamedTemporaryFile().name)
-        destination_file = path.join(ProviderImage.CACHE_DIR, cache_filename)
-        dfile = Gio.File.new_for_path(destination_file)
-        gfile.copy(dfile, Gio.FileCopyFlags.NONE, None, None, None)
-
-        self.set_image(destination_file)
-        return destination_file
+        try:
+            _, data, _ = gfile.load_contents(None)
+        except GLib.Error as error:
+            Logger.error("[ProviderImage] Couldn't read {}".format(file_uri))
+            Logger.error(str(error))
+            return None
+        extension = path.splitext(gfile.get_basename())[1]
+        return FaviconCache.get_default().store(data, extension)
 
     def do_image_downloaded(self, image_path, provider):
 
@@ -225,6 +280,5 @@ class ProviderImage(Gtk.Stack):
             # If the user didn't change the provider while downloading
             if provider.provider_id == self.provider.provider_id:
                 self.set_image(image_path)
-                self.set_state(ProviderImageState.FOUND)
             return
         self.set_state(ProviderImageState.NOT_FOUND)
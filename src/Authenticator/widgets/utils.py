@@ -19,7 +19,7 @@
 from gettext import gettext as _
 from gi.repository import Gtk
 
-__all__ = ['import_json', 'export_json']
+__all__ = ['import_json', 'export_json', 'import_qr_images', 'import_qr_folder']
 
 
 def import_json(parent: Gtk.Window) -> str:
@@ -32,6 +32,35 @@ def export_json(parent: Gtk.Window) -> str:
     return __open_file_chooser(parent, mimetype, Gtk.FileChooserAction.SAVE)
 
 
+def import_qr_images(parent: Gtk.Window) -> [str]:
+    """Select the QR codes images to import, return their paths."""
+    file_chooser = Gtk.FileChooserNative()
+    file_chooser.set_action(Gtk.FileChooserAction.OPEN)
+    file_chooser.set_transient_for(parent)
+    file_chooser.set_select_multiple(True)
+    filter_images = Gtk.FileFilter()
+    filter_images.set_name(_("Images"))
+    filter_images.add_pixbuf_formats()
+    file_chooser.add_filter(filter_images)
+    filenames = []
+    if file_chooser.run() == Gtk.ResponseType.ACCEPT:
+        filenames = file_chooser.get_filenames()
+    file_chooser.destroy()
+    return filenames
+
+
+def import_qr_folder(parent: Gtk.Window) -> str:
+    """Select a folder of QR codes images to import, return its path."""
+    file_chooser = Gtk.FileChooserNative()
+    file_chooser.set_action(Gtk.FileChooserAction.SELECT_FOLDER)
+    file_chooser.set_transient_for(parent)
+    folder = None
+    if file_chooser.run() == Gtk.ResponseType.ACCEPT:
+        folder = file_chooser.get_filename()
+    file_chooser.destroy()
+    return folder
+
+
 def __open_file_chooser(parent: Gtk.Window, mimetype: dict,
                         action=Gtk.FileChooserAction.OPEN) -> str:
     file_chooser = Gtk.FileChooserNative()
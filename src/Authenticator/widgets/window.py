@@ -16,11 +16,13 @@
  You should have received a copy of the GNU General Public License
  along with Authenticator. If not, see <http://www.gnu.org/licenses/>.
 """
-from gi.repository import Gtk, GObject, Gio, Handy
+from gettext import gettext as _, ngettext
+from gi.repository import Gtk, GObject, Gio, GLib, Handy
 
-from Authenticator.models import Logger, Settings, AccountsManager
+from Authenticator.models import Logger, Settings, AccountsManager, AccountsSnapshot, Database, FaviconCache, Keyring, Tracer, Usage
 from Authenticator.widgets.accounts.add import AddAccountWindow
 from Authenticator.widgets.accounts.list import AccountsWidget
+from Authenticator.widgets.notification import Notification
 
 
 class WindowView:
@@ -42,6 +44,7 @@ class Window(Gtk.ApplicationWindow):
     search_btn: Gtk.ToggleButton = Gtk.Template.Child()
     primary_menu_btn: Gtk.MenuButton = Gtk.Template.Child()
 
+    main_overlay: Gtk.Overlay = Gtk.Template.Child()
     main_stack: Gtk.Stack = Gtk.Template.Child()
     headerbar_stack: Gtk.Stack = Gtk.Template.Child()
     accounts_stack: Gtk.Stack = Gtk.Template.Child()
@@ -50,6 +53,7 @@ class Window(Gtk.ApplicationWindow):
     search_entry: Gtk.SearchEntry = Gtk.Template.Child()
     password_entry: Gtk.Entry = Gtk.Template.Child()
 
+    @Tracer.trace("Window.__init__")
     def __init__(self):
         super(Window, self).__init__()
         self.init_template('Window')
@@ -57,11 +61,11 @@ class Window(Gtk.ApplicationWindow):
         self.connect("notify::view", self.__state_changed)
 
         self.key_press_signal = None
+        self._qr_import = None
         self.restore_state()
-        # Start the Account Manager
-        AccountsManager.get_default()
 
         self.__init_widgets()
+        GLib.idle_add(Window.collect_favicons, priority=GLib.PRIORITY_LOW)
 
     @staticmethod
     def get_default() -> 'Window':
@@ -71,10 +75,71 @@ class Window(Gtk.ApplicationWindow):
         return Window.instance
 
     def close(self):
+        if self._qr_import:
+            self._qr_import.cancel()
         self.save_state()
-        AccountsManager.get_default().kill()
+        Usage.get_default().flush()
+        if AccountsManager.instance:
+            self.save_snapshot()
+            AccountsManager.get_default().kill()
         self.destroy()
 
+    @staticmethod
+    def collect_favicons():
+        """
+            Remove the cached favicons no provider uses anymore.
+
+            Runs once the main loop is idle after the startup.
+        """
+        from Authenticator.models import FaviconFetcher
+        providers = Database.get_default().get_providers() or []
+        max_bytes = Settings.get_default().favicons_cache_size * 1024 * 1024
+        FaviconCache.get_default().collect_garbage(
+            [provider.image for provider in providers],
+            [FaviconFetcher.normalize(provider.website) for provider in providers
+             if provider.website],
+            max_bytes)
+        return False
+
+    def import_qr_codes(self, paths: [str]):
+        """
+            Import the accounts of QR codes images, the progress is shown
+            in a notification.
+
+            :param paths: the images or folders of images
+        """
+        from Authenticator.models import QRImport
+        if self._qr_import:
+            self._qr_import.cancel()
+        self._qr_import = QRImport(paths)
+        self._qr_import.connect("progress", self.__on_qr_import_progress)
+        self._qr_import.connect("finished", self.__on_qr_import_finished)
+        self._qr_import.start()
+
+    def __on_qr_import_progress(self, qr_import, decoded: int, total: int):
+        # Stays visible until the import is finished
+        self._notification.message = _("Importing QR codes… {}/{}").format(decoded, total)
+        self._notification.set_reveal_child(True)
+
+    def __on_qr_import_finished(self, qr_import, added: int, duplicates: int, failed: int):
+        self._qr_import = None
+        message = ngettext("{} account imported", "{} accounts imported", added).format(added)
+        if duplicates:
+            message += ", " + ngettext("{} already existed", "{} already existed",
+                                       duplicates).format(duplicates)
+        if failed:
+            message += ", " + ngettext("{} image without a QR code",
+                                       "{} images without a QR code", failed).format(failed)
+        self._notification.send(message, show_close_btn=True)
+
+    def show_notification(self, message: str):
+        """
+            Show a message in the window's notification.
+
+            :param message: the message to show
+        """
+        self._notification.send(message, show_close_btn=True)
+
     def add_account(self, *_):
         if not self.get_application().is_locked:
             add_window = AddAccountWindow()
@@ -106,7 +171,7 @@ class Window(Gtk.ApplicationWindow):
             self.search_btn.set_property("active", toggled)
 
     def refresh_view(self, *_):
-        if AccountsManager.get_default().props.empty:
+        if AccountsWidget.get_default().is_empty:
             self.props.view = WindowView.EMPTY
         else:
             self.props.view = WindowView.NORMAL
@@ -119,6 +184,17 @@ class Window(Gtk.ApplicationWindow):
         settings.window_position = self.get_position()
         settings.window_maximized = self.is_maximized()
 
+    @staticmethod
+    def save_snapshot():
+        """
+            Save a snapshot of the accounts list for the next startup.
+        """
+        # Don't leave the accounts list around if the application is locked
+        if Keyring.get_default().can_be_locked:
+            AccountsSnapshot.clear()
+        else:
+            AccountsSnapshot.save(AccountsManager.get_default().accounts_per_provider)
+
     def restore_state(self):
         """
             Restore the window's state.
@@ -147,10 +223,12 @@ class Window(Gtk.ApplicationWindow):
         accounts_widget = AccountsWidget.get_default()
         accounts_widget.connect("account-removed", self.refresh_view)
         accounts_widget.connect("account-added", self.refresh_view)
+        accounts_widget.connect("accounts-loaded", self.refresh_view)
         self.accounts_stack.add_named(accounts_widget, "accounts")
         self.accounts_stack.set_visible_child_name("accounts")
 
-        AccountsManager.get_default().connect("notify::empty", self.refresh_view)
+        self._notification = Notification()
+        self.main_overlay.add_overlay(self._notification)
 
         self.search_bar.connect_entry(self.search_entry)
         self.search_bar.bind_property("search-mode-enabled", self.search_btn,
@@ -186,7 +264,6 @@ class Window(Gtk.ApplicationWindow):
 
     @Gtk.Template.Callback('unlock_btn_clicked')
     def __unlock_btn_clicked(self, *_):
-        from Authenticator.models import Keyring
         typed_password = self.password_entry.get_text()
         if typed_password == Keyring.get_default().get_password():
             self.get_application().set_property("is-locked", False)
@@ -201,29 +278,11 @@ class Window(Gtk.ApplicationWindow):
         """
             Handles search-changed signal.
         """
-        def filter_func(row, data, *_):
-            """
-                Filter function
-            """
-            data = data.lower()
-            if len(data) > 0:
-                username = row.account.username.lower()
-                provider_name = row.account.provider.name.lower()
-                return (
-                    data in username or data in provider_name
-                )
-            else:
-                return True
-        data = entry.get_text().strip()
-        search_lists = AccountsWidget.get_default().accounts_lists
-        results_count = 0
-        for search_list in search_lists:
-            search_list.set_filter_func(filter_func,
-                                        data, False)
-            for elem in search_list:
-
-                if elem.get_child_visible():
-                    results_count += 1
+        query = entry.get_text().strip()
+        accounts_widget = AccountsWidget.get_default()
+        # Show the most used accounts first while searching
+        accounts_widget.set_ranked(len(query) > 0)
+        results_count = accounts_widget.filter(query)
 
         if results_count == 0:
             self.accounts_stack.set_visible_child_name("empty_results")
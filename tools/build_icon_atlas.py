@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pack the icons of the providers catalog into an atlas.
+
+For each size, the icons are scaled & centered on a transparent square and
+stored one after the other as raw RGBA pixels, the icon number n starts at
+n * size * size * 4. The index maps the lowercased provider name to its
+icon number. Both are shipped in the gresource, which is memory mapped,
+so an icon is shown without any decoding nor network access.
+
+The icons come from a checkout of https://github.com/2factorauth/twofactorauth,
+the `img` of data/data.json is looked up in its img directory. Without it,
+an empty atlas is generated and the favicons are downloaded as before.
+
+Usage:
+    tools/build_icon_atlas.py --catalog data/data.json --icons-dir twofactorauth/img \\
+        --output-dir _build/data --sizes 48 96
+"""
+import argparse
+import json
+import sys
+from os import path, walk
+
+
+def find_icons(icons_dir: str) -> dict:
+    """Map the icons file names to their path."""
+    icons = {}
+    if icons_dir:
+        for root, _, filenames in walk(icons_dir):
+            for filename in filenames:
+                icons.setdefault(filename, path.join(root, filename))
+    return icons
+
+
+def render(GdkPixbuf, icon_path: str, size: int) -> bytes:
+    """Return the RGBA pixels of an icon, scaled & centered on a size x size square."""
+    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(icon_path, size, size, True)
+    if not pixbuf.get_has_alpha():
+        pixbuf = pixbuf.add_alpha(False, 0, 0, 0)
+    canvas = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, True, 8, size, size)
+    canvas.fill(0x00000000)
+    width, height = pixbuf.get_width(), pixbuf.get_height()
+    pixbuf.copy_area(0, 0, width, height, canvas,
+                     (size - width) // 2, (size - height) // 2)
+    pixels = canvas.get_pixels()
+    rowstride = canvas.get_rowstride()
+    return b"".join(pixels[row * rowstride:row * rowstride + size * 4]
+                    for row in range(size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", required=True,
+                        help="The providers catalog, data/data.json")
+    parser.add_argument("--icons-dir", default="",
+                        help="The directory containing the catalog icons")
+    parser.add_argument("--output-dir", required=True,
+                        help="Where to write provider-icons.json & provider-icons-SIZE.rgba")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[48, 96],
+                        help="The sizes of the icons (default: %(default)s)")
+    args = parser.parse_args()
+
+    with open(args.catalog, 'r') as file_obj:
+        catalog = json.load(file_obj)
+    icons = find_icons(args.icons_dir)
+
+    # icon path: the names of the providers using it
+    providers = {}
+    for name, provider in catalog.items():
+        icon_path = icons.get(provider.get("img") or "")
+        if icon_path:
+            providers.setdefault(icon_path, []).append(name.lower())
+
+    # name: icon number, the icons shared by several providers are packed once
+    entries = {}
+    atlases = {size: [] for size in args.sizes}
+    if providers:
+        from gi import require_version
+        require_version('GdkPixbuf', '2.0')
+        from gi.repository import GdkPixbuf, GLib
+        for icon_path, names in providers.items():
+            try:
+                pixels = {size: render(GdkPixbuf, icon_path, size) for size in args.sizes}
+            except GLib.Error as error:
+                print("Skipping {}: {}".format(icon_path, error), file=sys.stderr)
+                continue
+            slot = len(atlases[args.sizes[0]])
+            for size in args.sizes:
+                atlases[size].append(pixels[size])
+            entries.update((name, slot) for name in names)
+
+    for size, pixels in atlases.items():
+        with open(path.join(args.output_dir, "provider-icons-{}.rgba".format(size)), 'wb') as file_obj:
+            file_obj.write(b"".join(pixels))
+    with open(path.join(args.output_dir, "provider-icons.json"), 'w') as file_obj:
+        json.dump({"version": 1, "sizes": args.sizes, "icons": entries}, file_obj)
+    print("Packed {} icons for {} providers".format(len(atlases[args.sizes[0]]), len(entries)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Import time regression check for Authenticator's entry points.
+
+Runs the imports done by the application and by the GNOME Shell search
+provider under `python3 -X importtime` and fails if they go over budget
+or if they pull in one of the heavy optional dependencies
+(QR decoding, favicon download) that should only be loaded on first use.
+
+Usage:
+    tools/importtime.py --pythondir _build/src --gresource _build/data/*.gresource
+"""
+import argparse
+import subprocess
+import sys
+from os import environ, path, pathsep
+
+SRC_DIR = path.join(path.dirname(path.realpath(__file__)), "../src")
+
+PRELUDE = """
+from gi import require_version
+require_version('Gtk', '3.0')
+require_version('Gdk', '3.0')
+require_version('Secret', '1')
+"""
+
+ENTRY_POINTS = {
+    "search-provider": {
+        "code": PRELUDE + """
+from Authenticator.models import Account, Clipboard, Keyring, SearchIndex, Usage
+""",
+        "budget": 250,
+    },
+    "application": {
+        "code": PRELUDE + """
+require_version('Handy', '0.0')
+from gi.repository import Gio
+if {gresource!r}:
+    Gio.Resource._register(Gio.resource_load({gresource!r}))
+from Authenticator.application import Application
+""",
+        "budget": 600,
+    },
+}
+
+# Modules that must never be imported at startup
+FORBIDDEN = ["PIL", "pyzbar", "pyfavicon", "aiohttp", "bs4", "yoyo"]
+
+
+def measure(code: str, pythondir: str) -> (float, [str]):
+    """
+    Run a snippet with -X importtime.
+
+    :return: the total import time in ms and the list of imported modules
+    """
+    env = dict(environ)
+    env["PYTHONPATH"] = pathsep.join(filter(None, [pythondir, SRC_DIR,
+                                                   env.get("PYTHONPATH")]))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                             env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        sys.exit(process.stderr)
+    total = 0
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        modules.append(module.strip())
+        # Nested imports are indented, only count the top level ones
+        if not module[1:].startswith(" "):
+            total += int(cumulative)
+    return total / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pythondir", default=None,
+                        help="Directory containing the configured Authenticator package")
+    parser.add_argument("--gresource", default=None,
+                        help="The compiled gresource bundle, needed by the widgets templates")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Number of runs, the best one is kept")
+    for name, entry in ENTRY_POINTS.items():
+        parser.add_argument("--{}-budget".format(name), type=float,
+                            default=entry["budget"],
+                            help="Import time budget in ms (default: %(default)s)")
+    args = parser.parse_args()
+
+    failed = False
+    for name, entry in ENTRY_POINTS.items():
+        code = entry["code"].format(gresource=args.gresource)
+        budget = getattr(args, "{}_budget".format(name.replace("-", "_")))
+        best = None
+        for _ in range(max(args.runs, 1)):
+            total, modules = measure(code, args.pythondir)
+            best = total if best is None else min(best, total)
+
+        loaded = sorted({module.split(".")[0] for module in modules}
+                        & set(FORBIDDEN))
+        status = "OK"
+        if best > budget or loaded:
+            status = "FAIL"
+            failed = True
+        print("{:<16} {:>8.1f} ms (budget {:.0f} ms) {}".format(name, best,
+                                                                  budget, status))
+        for module in loaded:
+            print("  {} should not be imported on startup".format(module))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+QR decoding benchmark.
+
+Decodes a corpus of QR screenshots with the full resolution image given
+to zbar as is, and with the QRReader passes cascade, then reports the
+decode time and the success rate of both.
+
+The corpus is a directory of images, each containing a QR code.
+A synthetic one can be generated with --generate: HiDPI sized captures,
+low contrast, blurred & noisy QR codes (requires qrcode).
+
+Usage:
+    tools/qr_benchmark.py --generate /tmp/qr-corpus --count 40
+    tools/qr_benchmark.py --pythondir _build/src /tmp/qr-corpus
+"""
+import argparse
+import random
+import sys
+from os import listdir, makedirs, path
+from statistics import mean, median
+from time import perf_counter
+
+SRC_DIR = path.join(path.dirname(path.realpath(__file__)), "../src")
+
+# name: (screenshot size, QR module size, dark, light, blur radius)
+VARIANTS = {
+    "hidpi": ((3840, 2160), 12, 0, 255, 0),
+    "selection": ((900, 700), 6, 0, 255, 0),
+    "low-contrast": ((1920, 1080), 8, 105, 140, 0),
+    "blurred": ((2560, 1440), 10, 30, 220, 2),
+}
+
+
+def generate(directory: str, count: int):
+    try:
+        import qrcode
+    except ImportError:
+        sys.exit("Please install qrcode first")
+    from PIL import Image, ImageFilter
+
+    makedirs(directory, exist_ok=True)
+    rng = random.Random(0)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+    for number in range(count):
+        name, (size, module, dark, light, blur) = list(VARIANTS.items())[number % len(VARIANTS)]
+        secret = "".join(rng.choice(alphabet) for _ in range(32))
+        uri = "otpauth://totp/Provider{0}:user{0}@example.com?secret={1}&issuer=Provider{0}".format(
+            number, secret)
+        code = qrcode.make(uri, box_size=module).get_image().convert("L")
+        code = code.point(lambda value: dark if value < 128 else light)
+        screenshot = Image.new("L", size, light)
+        screenshot.paste(code, (rng.randrange(size[0] - code.width),
+                                rng.randrange(size[1] - code.height)))
+        if blur:
+            screenshot = screenshot.filter(ImageFilter.GaussianBlur(blur))
+        screenshot.convert("RGB").save(path.join(directory, "{:03}-{}.png".format(number, name)))
+    print("Generated {} screenshots in {}".format(count, directory))
+
+
+def benchmark(directory: str, repeat: int):
+    from PIL import Image
+    from pyzbar.pyzbar import decode
+    from Authenticator.models.qr_reader import QRReader
+
+    decoders = {
+        "full resolution": lambda image: [result.data for result in decode(image)],
+        "cascade": QRReader.decode,
+    }
+    images = []
+    for filename in sorted(listdir(directory)):
+        with Image.open(path.join(directory, filename)) as image:
+            image.load()
+            images.append((filename, image.copy()))
+    print("{} images\n".format(len(images)))
+    print("{:<16} {:>10} {:>10} {:>10} {:>8}".format("decoder", "median ms", "mean ms",
+                                                   "max ms", "success"))
+    for name, decoder in decoders.items():
+        timings = []
+        found = 0
+        for _, image in images:
+            best = None
+            for _ in range(repeat):
+                start = perf_counter()
+                results = decoder(image)
+                elapsed = perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best * 1000)
+            found += bool(results)
+        print("{:<16} {:>10.1f} {:>10.1f} {:>10.1f} {:>7.0f}%".format(
+            name, median(timings), mean(timings), max(timings), 100 * found / len(images)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", default=None,
+                        help="Directory of QR screenshots")
+    parser.add_argument("--pythondir", default=None,
+                        help="Directory containing the configured Authenticator package")
+    parser.add_argument("--generate", metavar="DIRECTORY", default=None,
+                        help="Generate a synthetic corpus in DIRECTORY")
+    parser.add_argument("--count", type=int, default=40,
+                        help="Number of generated screenshots (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Decode each image N times and keep the best (default: %(default)s)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SRC_DIR)
+    if args.pythondir:
+        sys.path.insert(0, args.pythondir)
+    if args.generate:
+        generate(args.generate, args.count)
+    corpus = args.corpus or args.generate
+    if not corpus:
+        parser.error("a corpus directory or --generate is required")
+    benchmark(corpus, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
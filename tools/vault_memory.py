@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Memory footprint of the accounts records.
+
+Builds the accounts the way AccountsManager loads them from the database
+(the accounts of a provider share the same Provider object) and reports
+the memory allocated for them with tracemalloc.
+
+The secrets are served from memory instead of the keyring and are
+allocated before the measure starts, only the records are counted.
+
+Usage:
+    tools/vault_memory.py --pythondir _build/src --accounts 50000
+"""
+import argparse
+import base64
+import sys
+import tracemalloc
+from hashlib import sha256
+from os import path
+
+SRC_DIR = path.join(path.dirname(path.realpath(__file__)), "../src")
+
+
+class MemoryKeyring:
+    """Serves the secrets from a dict instead of the keyring."""
+
+    def __init__(self, secrets: dict):
+        self.secrets = secrets
+
+    def get_by_id(self, token_id: str) -> str:
+        return self.secrets.get(token_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pythondir", default=None,
+                        help="Directory containing the configured Authenticator package")
+    parser.add_argument("--accounts", type=int, default=50000,
+                        help="Number of accounts (default: %(default)s)")
+    parser.add_argument("--providers", type=int, default=500,
+                        help="Number of providers (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Show the lines allocating the most memory")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SRC_DIR)
+    if args.pythondir:
+        sys.path.insert(0, args.pythondir)
+    from gi import require_version
+    require_version('Gtk', '3.0')
+    require_version('Gdk', '3.0')
+    require_version('Secret', '1')
+    from Authenticator.models import Account, Keyring, Provider
+    from Authenticator.models.database import Account as AccountRow
+
+    # What the database & the keyring return, allocated before the measure
+    secrets = {}
+    rows = []
+    for account_id in range(args.accounts):
+        secret = base64.b32encode(sha256(str(account_id).encode()).digest()[:20]).decode()
+        token_id = sha256(secret.encode()).hexdigest()
+        secrets[token_id] = secret
+        rows.append(AccountRow(account_id, "user{}@example.com".format(account_id),
+                               token_id, account_id % args.providers))
+    Keyring.instance = MemoryKeyring(secrets)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    providers = [Provider(provider_id, "Provider {}".format(provider_id),
+                          "https://provider{}.example.com".format(provider_id))
+                 for provider_id in range(args.providers)]
+    accounts = [Account(*row._replace(provider=providers[row.provider])) for row in rows]
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print("{} accounts, {} providers".format(len(accounts), len(providers)))
+    print("records: {:>10.1f} KiB ({:.0f} bytes per account)".format(size / 1024,
+                                                                      size / len(accounts)))
+    print("peak:    {:>10.1f} KiB".format(peak / 1024))
+    for stat in after.compare_to(before, "lineno")[:args.top]:
+        print("  {}".format(stat))
+
+
+if __name__ == "__main__":
+    main()